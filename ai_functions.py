@@ -0,0 +1,131 @@
+import numpy as np
+
+from components.ai import BasicMonster
+from profiler import profiler
+
+def take_enemy_turns(player, entities, game_map, fov_map, actors = None):
+    """
+    Plays the turns of actors (entities, in the order they act), or of every entity with an AI.
+    Results are the same, and in the same order, as calling ai.take_turn for each of them in that order,
+    and stop right after the player dies.
+    BasicMonsters are checked for FOV and distance all at once, and the ones walking down the distance map
+    are moved together. Other AIs (ConfusedMonster...) and attacks still go through take_turn
+    """
+    store = entities.store
+
+    if actors is None:
+        slots = np.flatnonzero(store.column('has_ai')).tolist()
+    else:
+        slots = [entity.slot for entity in actors]
+
+    results = []
+
+    # An entity acting twice needs its first action done before deciding the second one
+    wave = []
+    in_wave = set()
+    for slot in slots:
+        if slot in in_wave:
+            if play_wave(wave, player, entities, game_map, fov_map, results):
+                return results
+            wave = []
+            in_wave.clear()
+
+        wave.append(slot)
+        in_wave.add(slot)
+
+    play_wave(wave, player, entities, game_map, fov_map, results)
+
+    return results
+
+def play_wave(slots, player, entities, game_map, fov_map, results):
+    """
+    Turns of the entities in slots (each one at most once), results are added to results.
+    Returns True if the player died
+    """
+    if not slots:
+        return False
+
+    store = entities.store
+    actors = np.array(slots)
+
+    # BasicMonster.take_turn decisions for everybody: in FOV, and close enough to attack
+    xs = store.column('x')[actors]
+    ys = store.column('y')[actors]
+    in_fov = fov_map.fov[xs, ys]
+    adjacent = (xs - player.x) ** 2 + (ys - player.y) ** 2 < 4
+    downhill = game_map.pathfinder.distance_origin == (player.x, player.y)
+
+    # Monsters going down the distance map, moved together when somebody else has to act first
+    movers = []
+
+    for slot, seen, near in zip(slots, in_fov.tolist(), adjacent.tolist()):
+        entity = store.entities[slot]
+        ai = entity.ai
+
+        # Attacks don't care where the others are, anything that may move does:
+        # the monsters waiting to move before it go first
+        if type(ai) is BasicMonster:
+            if not seen:
+                continue
+            if not near:
+                if downhill:
+                    movers.append(slot)
+                    continue
+
+                move_downhill_together(movers, player, entities, game_map)
+                movers = []
+        else:
+            move_downhill_together(movers, player, entities, game_map)
+            movers = []
+
+        with profiler.ai_phase(ai):
+            entity_results = ai.take_turn(player, fov_map, game_map, entities)
+        results.extend(entity_results)
+
+        if any(result.get('dead') == player for result in entity_results):
+            # Nobody after the killer acts anymore
+            move_downhill_together(movers, player, entities, game_map)
+            return True
+
+    move_downhill_together(movers, player, entities, game_map)
+
+    return False
+
+def move_downhill_together(slots, player, entities, game_map):
+    """
+    Moves the monsters in slots one step down the distance map, ending up exactly where moving them one by one
+    in slots order would. Every round moves all monsters that no monster before them, still waiting to move,
+    can get in the way of: one that close may take the tile they want or free a better one
+    """
+    if not slots:
+        return
+
+    store = entities.store
+    pathfinder = game_map.pathfinder
+    pending = np.array(slots)
+
+    with profiler.phase('ai.batch'):
+        while len(pending):
+            xs = store.column('x')[pending]
+            ys = store.column('y')[pending]
+
+            # Steps are one tile, so monsters more than 2 tiles apart can't get in each other's way
+            close = (np.abs(xs[:, np.newaxis] - xs) <= 2) & (np.abs(ys[:, np.newaxis] - ys) <= 2)
+            ready = ~np.tril(close, k=-1).any(axis=1)
+
+            new_xs, new_ys, found = pathfinder.downhill_steps(xs[ready], ys[ready])
+
+            for slot, x, y, step_found in zip(pending[ready].tolist(), new_xs.tolist(), new_ys.tolist(),
+                                              found.tolist()):
+                entity = store.entities[slot]
+
+                if step_found:
+                    pathfinder.move_entity(entity.x, entity.y, x, y)
+                    pathfinder.forget(entity)
+                    entity.set_position(x, y)
+                else:
+                    # Same backup as Entity.move_downhill
+                    entity.move_towards(player.x, player.y, game_map, entities)
+
+            pending = pending[~ready]
+            profiler.count('ai_batch_rounds')
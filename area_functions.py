@@ -0,0 +1,129 @@
+import numpy as np
+import tcod as libtcod
+
+def square(x, y, radius, width, height):
+    # Slices of the map arrays around (x, y), cut at the map edges
+    return (slice(max(x - radius, 0), min(x + radius + 1, width)),
+            slice(max(y - radius, 0), min(y + radius + 1, height)))
+
+def distance_sq_box(xs, ys, x, y):
+    # Squared distances from (x, y) for the box, no square roots
+    dx = np.arange(xs.start, xs.stop) - x
+    dy = np.arange(ys.start, ys.stop) - y
+    return dx[:, np.newaxis] ** 2 + dy[np.newaxis, :] ** 2, dx, dy
+
+def in_sight_box(transparent, xs, ys, x, y, radius):
+    # Tiles of the box seen from (x, y): walls stop blasts the way they stop sight
+    return libtcod.map.compute_fov(transparent[xs, ys], (x - xs.start, y - ys.start), radius,
+                                   light_walls=True, algorithm=libtcod.FOV_BASIC)
+
+def box_tiles(xs, ys, mask):
+    tile_xs, tile_ys = np.nonzero(mask)
+    return tile_xs + xs.start, tile_ys + ys.start
+
+def circle(transparent, origin_x, origin_y, target_x, target_y, radius, line_of_sight = True, **kwargs):
+    """
+    Tiles not farther than radius from the target tile (and seen from it)
+    """
+    width, height = transparent.shape
+    xs, ys = square(target_x, target_y, radius, width, height)
+    distance_sq, _, _ = distance_sq_box(xs, ys, target_x, target_y)
+
+    mask = distance_sq <= radius ** 2
+    if line_of_sight:
+        mask &= in_sight_box(transparent, xs, ys, target_x, target_y, radius)
+
+    return box_tiles(xs, ys, mask)
+
+def cone(transparent, origin_x, origin_y, target_x, target_y, radius, angle = 90, line_of_sight = True, **kwargs):
+    """
+    Tiles not farther than radius from the caster, less than angle / 2 degrees away from the direction
+    to the target. The caster's own tile is not in it
+    """
+    width, height = transparent.shape
+    xs, ys = square(origin_x, origin_y, radius, width, height)
+    distance_sq, dx, dy = distance_sq_box(xs, ys, origin_x, origin_y)
+
+    direction_x = target_x - origin_x
+    direction_y = target_y - origin_y
+    direction_sq = direction_x ** 2 + direction_y ** 2
+    if direction_sq == 0:
+        return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp)
+
+    # cos(a) >= cos(angle / 2) without square roots: dot >= 0 and dot^2 >= cos^2 * |d|^2 * |v|^2
+    dot = dx[:, np.newaxis] * direction_x + dy[np.newaxis, :] * direction_y
+    cos_sq = np.cos(np.radians(angle / 2)) ** 2
+    mask = (distance_sq <= radius ** 2) & (distance_sq > 0) & (dot >= 0) & (dot ** 2 >= cos_sq * distance_sq * direction_sq)
+
+    if line_of_sight:
+        mask &= in_sight_box(transparent, xs, ys, origin_x, origin_y, radius)
+
+    return box_tiles(xs, ys, mask)
+
+def line(transparent, origin_x, origin_y, target_x, target_y, radius = None, **kwargs):
+    """
+    Tiles from the caster to the target (the caster's own tile is not in it), up to radius tiles long.
+    Stops at the first wall
+    """
+    tiles = libtcod.los.bresenham((origin_x, origin_y), (target_x, target_y))[1:]
+    if radius is not None:
+        tiles = tiles[:radius]
+
+    walls = np.flatnonzero(~transparent[tiles[:, 0], tiles[:, 1]])
+    if len(walls):
+        tiles = tiles[:walls[0]]
+
+    return tiles[:, 0].astype(np.intp), tiles[:, 1].astype(np.intp)
+
+# Shapes an item can hit: name -> function(transparent, origin_x, origin_y, target_x, target_y, **kwargs)
+# returning the (xs, ys) of the tiles hit. The origin is the caster, the target is the tile clicked
+AREAS = {
+    'circle': circle,
+    'cone': cone,
+    'line': line
+}
+
+def area_tiles(area, transparent, origin_x, origin_y, target_x, target_y, **kwargs):
+    # kwargs - the shape's own settings (radius, angle...), the rest of an item's kwargs is ignored
+    return AREAS[area](transparent, origin_x, origin_y, target_x, target_y, **kwargs)
+
+def entities_on_tiles(entities, xs, ys, visible = None):
+    """
+    Entities standing on the tiles, through the spatial index: costs as much as the tiles, not the level.
+    visible - only the tiles in sight count if given
+    """
+    if visible is not None:
+        in_view = visible[xs, ys]
+        xs = xs[in_view]
+        ys = ys[in_view]
+
+    results = []
+    for x, y in zip(xs.tolist(), ys.tolist()):
+        results.extend(entities.at(x, y))
+
+    return results
+
+def nearest(entities, x, y, max_distance, k = 1, visible = None, condition = None):
+    """
+    Up to k entities closer than max_distance to (x, y), closest first.
+    visible - only entities on tiles in sight count, condition - function(entity) they have to pass
+    """
+    max_distance_sq = max_distance ** 2
+    candidates = []
+
+    # Only the ones around (x, y) can be close enough
+    for entity in entities.in_radius(x, y, max_distance):
+        if visible is not None and not visible[entity.x, entity.y]:
+            continue
+        if condition and not condition(entity):
+            continue
+
+        distance_sq = (entity.x - x) ** 2 + (entity.y - y) ** 2
+        if distance_sq < max_distance_sq:
+            candidates.append((distance_sq, entity.slot, entity))
+
+    # Equally close ones in the entities list order (slot order is the same). The spatial index order
+    # would change every time somebody leaves a tile and comes back
+    candidates.sort(key=lambda candidate: candidate[:2])
+
+    return [entity for distance_sq, slot, entity in candidates[:k]]
@@ -0,0 +1,119 @@
+"""
+Turn throughput benchmark. Plays random games headless and reports turns/sec,
+time per phase and memory. Run from the repository root:
+
+    python -m benchmarks.bench_turns --map-width 200 --map-height 200 --max-rooms 300 --turns 2000
+
+or replays a recorded session instead (--recording recordings/session-...), to measure real play
+
+Exits with code 1 if --min-turns-per-sec is given and the run was slower, so it can be used in CI
+"""
+import argparse
+import json
+import random
+import sys
+import time
+import tracemalloc
+
+from headless import random_actions, run_headless
+from loader_functions.initialize_new_game import get_constants
+from replay import replay_session
+
+def run_recording_benchmark(args):
+    constants = get_constants()
+    constants['ai_distance_map'] = not args.astar
+
+    tracemalloc.start()
+    report = replay_session(args.recording, constants)
+    peak_memory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {
+        'games': 1,
+        'turns': report['turns'],
+        'turns_per_sec': report['turns'] / report['seconds'] if report['seconds'] else 0.0,
+        'phases_ms': {'replay': report['seconds'] * 1000},
+        'peak_memory_kb': peak_memory / 1024,
+        'desyncs': len(report['desyncs'])
+    }
+
+def run_benchmark(args):
+    if args.recording:
+        return run_recording_benchmark(args)
+
+    constants = get_constants()
+    constants.update({
+        'map_width': args.map_width,
+        'map_height': args.map_height,
+        'max_rooms': args.max_rooms,
+        'max_monsters_per_room': args.monsters_per_room,
+        'max_items_per_room': args.items_per_room,
+        'player_hp': args.player_hp,
+        'ai_distance_map': not args.astar
+    })
+
+    total_turns = 0
+    total_time = 0.0
+    timings = {}
+    peak_memory = 0
+
+    for game in range(args.games):
+        # Map generation still uses the global random module
+        random.seed(args.seed + game)
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        game_variables, turns_played = run_headless(random_actions(random.Random(args.seed + game)), args.turns,
+                                                    constants, timings)
+        total_time += time.perf_counter() - start
+        peak_memory = max(peak_memory, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+
+        total_turns += turns_played
+
+    turn_time = total_time - timings.get('map_generation', 0.0)
+
+    return {
+        'games': args.games,
+        'turns': total_turns,
+        'turns_per_sec': total_turns / turn_time if turn_time else 0.0,
+        'phases_ms': {phase: seconds * 1000 for phase, seconds in sorted(timings.items())},
+        'peak_memory_kb': peak_memory / 1024
+    }
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description='Headless turn throughput benchmark')
+    parser.add_argument('--map-width', type=int, default=80)
+    parser.add_argument('--map-height', type=int, default=43)
+    parser.add_argument('--max-rooms', type=int, default=30)
+    parser.add_argument('--monsters-per-room', type=int, default=3)
+    parser.add_argument('--items-per-room', type=int, default=4)
+    parser.add_argument('--player-hp', type=int, default=30, help='raise it to keep the player alive in dense levels')
+    parser.add_argument('--turns', type=int, default=1000, help='player turns per game')
+    parser.add_argument('--games', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--astar', action='store_true', help='monsters use A* instead of the shared distance map')
+    parser.add_argument('--recording', default=None, help='replay this recorded session instead of random games')
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    parser.add_argument('--min-turns-per-sec', type=float, default=None)
+    args = parser.parse_args(argv)
+
+    report = run_benchmark(args)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print('{0} games, {1} turns, {2:.1f} turns/sec, peak memory {3:.0f} KB'.format(
+            report['games'], report['turns'], report['turns_per_sec'], report['peak_memory_kb']))
+        for phase, ms in report['phases_ms'].items():
+            print('  {0:<16}{1:10.1f} ms'.format(phase, ms))
+
+    if args.min_turns_per_sec is not None and report['turns_per_sec'] < args.min_turns_per_sec:
+        print('Too slow: {0:.1f} < {1:.1f} turns/sec'.format(report['turns_per_sec'], args.min_turns_per_sec),
+              file=sys.stderr)
+        return 1
+
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
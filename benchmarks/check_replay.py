@@ -0,0 +1,109 @@
+"""
+Replay determinism check. Plays random games headless while recording them the way the game does,
+then replays every recording with a checkpoint drawn at every turn. Run from the repository root:
+
+    python -m benchmarks.check_replay --games 3 --turns 800
+
+Exits with code 1 if any replay desynced, so it can be used in CI
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+
+from fov_functions import initialize_fov, recompute_fov
+from game_states import GameStates
+from headless import random_actions
+from loader_functions.initialize_new_game import get_constants, get_game_variables
+from loader_functions.turn_journal import TurnJournal, take_snapshot
+from replay import InputRecorder, replay_session
+from turn_functions import TurnState, play_player_turn, play_enemy_turn
+
+def record_game(constants, action_source, turns, path):
+    """
+    Plays like engine.main, with the journal, snapshots and session recording, until turns turns are played
+    or the player dies. Returns the recorded session directory and the turn it started on
+    """
+    save_path = os.path.join(path, 'save')
+    session_path = os.path.join(path, 'session')
+
+    player, entities, game_map, message_log, game_state = get_game_variables(constants)
+    turn_state = TurnState(game_state)
+
+    journal = TurnJournal(save_path)
+    seed = take_snapshot(save_path, journal, player, entities, game_map, message_log, turn_state)
+    turn_state.results = []
+
+    recorder = InputRecorder(session_path)
+    recorder.start(save_path, turn_state.turn, seed)
+    start_turn = turn_state.turn
+
+    fov_map = initialize_fov(game_map)
+
+    while turn_state.turn - start_turn < turns and turn_state.game_state != GameStates.PLAYER_DEAD:
+        if turn_state.fov_recompute:
+            recompute_fov(fov_map, player.x, player.y, constants['fov_radius'], constants['fov_light_walls'],
+                          constants['fov_algorithm'])
+            turn_state.fov_recompute = False
+
+        action, mouse_action = action_source(player, entities, game_map, fov_map, turn_state)
+
+        if play_player_turn(action, mouse_action, player, entities, game_map, fov_map, message_log, turn_state):
+            break
+
+        play_enemy_turn(player, entities, game_map, fov_map, message_log, turn_state, constants['ai_distance_map'],
+                        constants['monster_wake_radius'])
+
+        if action or mouse_action:
+            journal.record(action, mouse_action, turn_state.results)
+            recorder.record(action, mouse_action, turn_state.results)
+        turn_state.results.clear()
+
+        if (turn_state.game_state == GameStates.PLAYERS_TURN and
+                turn_state.turn - journal.turn >= constants['snapshot_interval']):
+            recorder.snapshot(take_snapshot(save_path, journal, player, entities, game_map, message_log, turn_state))
+
+    journal.close()
+    recorder.close()
+
+    return session_path, start_turn
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description='Record random games and check that they replay the same')
+    parser.add_argument('--games', type=int, default=3)
+    parser.add_argument('--turns', type=int, default=800, help='player turns per game')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--player-hp', type=int, default=400, help='raise it to keep the player alive longer')
+    parser.add_argument('--snapshot-interval', type=int, default=50)
+    args = parser.parse_args(argv)
+
+    failed = False
+
+    for game in range(args.games):
+        constants = get_constants()
+        constants.update({
+            'seed': args.seed + game,
+            'player_hp': args.player_hp,
+            'snapshot_interval': args.snapshot_interval
+        })
+
+        with tempfile.TemporaryDirectory() as path:
+            session_path, start_turn = record_game(constants, random_actions(random.Random(args.seed + game)),
+                                                   args.turns, path)
+
+            # A checkpoint every turn: drawing them must not change the game being replayed
+            report = replay_session(session_path, constants, checkpoints=range(start_turn, start_turn + args.turns + 1),
+                                    checkpoint_dir=os.path.join(path, 'checkpoints'))
+
+        print('Game {0}: {1} inputs, {2} turns, {3} desyncs'.format(args.seed + game, report['inputs'],
+                                                                   report['turns'], len(report['desyncs'])))
+        for input_number, turn in report['desyncs'][:10]:
+            print('  Desync at input {0} (turn {1})'.format(input_number, turn))
+
+        failed |= bool(report['desyncs'])
+
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,52 @@
+class Camera:
+    """
+    The part of the map that fits on the screen. (x, y) is the map tile shown in the top left corner
+    """
+    def __init__(self, width, height):
+        self.x = 0
+        self.y = 0
+        self.width = width
+        self.height = height
+
+        # Size of the map the camera is looking at, set by follow
+        self.map_width = 0
+        self.map_height = 0
+
+    def follow(self, target_x, target_y, map_width, map_height):
+        # Keep the target in the middle, but never show anything outside the map
+        x = min(max(target_x - self.width // 2, 0), max(map_width - self.width, 0))
+        y = min(max(target_y - self.height // 2, 0), max(map_height - self.height, 0))
+
+        moved = (x, y) != (self.x, self.y)
+        self.x = x
+        self.y = y
+        self.map_width = map_width
+        self.map_height = map_height
+
+        return moved
+
+    def to_map(self, screen_x, screen_y):
+        # None if the screen point is not over the map view (UI panel, for example)
+        if not (0 <= screen_x < self.width and 0 <= screen_y < self.height):
+            return None
+
+        map_x = screen_x + self.x
+        map_y = screen_y + self.y
+
+        # The map can be smaller than the view
+        if not (map_x < self.map_width and map_y < self.map_height):
+            return None
+
+        return (map_x, map_y)
+
+    def to_screen(self, map_x, map_y):
+        return (map_x - self.x, map_y - self.y)
+
+    def in_view(self, map_x, map_y):
+        return (self.x <= map_x < self.x + self.width and
+                self.y <= map_y < self.y + self.height)
+
+    def view_slices(self, map_width, map_height):
+        # Slices of the map arrays visible through the camera
+        return (slice(self.x, min(self.x + self.width, map_width)),
+                slice(self.y, min(self.y + self.height, map_height)))
@@ -1,20 +1,25 @@
 import tcod as libtcod
 
-from random import randint
-
 from game_messages import Message
+from rng_streams import rng
 
 class BasicMonster:
+    __slots__ = ('owner',)
+
     def __init__(self):
         self.owner = None
 
     def take_turn(self, target, fov_map, game_map, entities):
         results = []
         monster = self.owner
-        if libtcod.map_is_in_fov(fov_map, monster.x, monster.y):
+        if fov_map.fov[monster.x, monster.y]:
             if monster.distance_to(target) >= 2:
                 #monster.move_towards(target.x, target.y, game_map, entities)
-                monster.move_astar(target, entities, game_map)
+                if game_map.pathfinder.distance_origin == (target.x, target.y):
+                    # The engine already flooded the map from the target this turn
+                    monster.move_downhill(target, entities, game_map)
+                else:
+                    monster.move_astar(target, entities, game_map)
             elif target.fighter.hp > 0:
                 attack_results = monster.fighter.attack(target)
                 results.extend(attack_results)
@@ -22,6 +27,8 @@ class BasicMonster:
         return results
 
 class ConfusedMonster:
+    __slots__ = ('owner', 'previous_ai', 'number_of_turns')
+
     def __init__(self, previous_ai, number_of_turns=10):
         self.owner = None
         self.previous_ai = previous_ai
@@ -31,8 +38,9 @@ class ConfusedMonster:
         results = []
 
         if self.number_of_turns > 0:
-            random_x = self.owner.x + randint(0, 2) - 1
-            random_y = self.owner.y + randint(0, 2) - 1
+            ai_rng = rng.stream('ai')
+            random_x = self.owner.x + ai_rng.randint(0, 2) - 1
+            random_y = self.owner.y + ai_rng.randint(0, 2) - 1
 
             if random_x != self.owner.x and random_y != self.owner.y:
                 self.owner.move_towards(random_x, random_y, game_map, entities)
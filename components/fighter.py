@@ -1,6 +1,11 @@
 from game_messages import Message
 
 class Fighter:
+    """
+    Stats live in the owner's EntityStore row while the owner is on a level, in the fighter itself otherwise
+    """
+    __slots__ = ('owner', '_hp', '_max_hp', '_defense', '_power')
+
     def __init__(self, hp, defense, power):
         self.owner = None
         self.max_hp = hp
@@ -8,6 +13,65 @@ class Fighter:
         self.defense = defense
         self.power = power
 
+    def _row(self):
+        # (store, slot) of the owner, or None while the stats are kept here
+        owner = self.owner
+        if owner is None or owner.store is None:
+            return None
+        return owner.store, owner.slot
+
+    @property
+    def hp(self):
+        row = self._row()
+        return self._hp if row is None else row[0].hp[row[1]]
+
+    @hp.setter
+    def hp(self, value):
+        row = self._row()
+        if row is None:
+            self._hp = value
+        else:
+            row[0].hp[row[1]] = value
+
+    @property
+    def max_hp(self):
+        row = self._row()
+        return self._max_hp if row is None else row[0].max_hp[row[1]]
+
+    @max_hp.setter
+    def max_hp(self, value):
+        row = self._row()
+        if row is None:
+            self._max_hp = value
+        else:
+            row[0].max_hp[row[1]] = value
+
+    @property
+    def defense(self):
+        row = self._row()
+        return self._defense if row is None else row[0].defense[row[1]]
+
+    @defense.setter
+    def defense(self, value):
+        row = self._row()
+        if row is None:
+            self._defense = value
+        else:
+            row[0].defense[row[1]] = value
+
+    @property
+    def power(self):
+        row = self._row()
+        return self._power if row is None else row[0].power[row[1]]
+
+    @power.setter
+    def power(self, value):
+        row = self._row()
+        if row is None:
+            self._power = value
+        else:
+            row[0].power[row[1]] = value
+
     def take_damage(self, amount):
         results = []
         self.hp -= amount
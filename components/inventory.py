@@ -3,10 +3,14 @@ import tcod as libtcod
 from game_messages import Message
 
 class Inventory:
+    __slots__ = ('owner', 'capacity', 'items', 'version')
+
     def __init__(self, capacity):
         self.owner = None
         self.capacity = capacity
         self.items = []
+        # Goes up on every change of items, so the inventory menu knows when to draw them again
+        self.version = 0
 
     def add_item(self, item):
         results = []
@@ -23,11 +27,13 @@ class Inventory:
             })
 
             self.items.append(item)
+            self.version += 1
 
         return results
 
     def remove_item(self, item):
         self.items.remove(item)
+        self.version += 1
 
     def use(self, item_entity, **kwargs):
         results = []
@@ -56,8 +62,7 @@ class Inventory:
     def drop_item(self, item):
         results = []
 
-        item.x = self.owner.x
-        item.y = self.owner.y
+        item.set_position(self.owner.x, self.owner.y)
 
         self.remove_item(item)
         results.append({
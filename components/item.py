@@ -1,4 +1,6 @@
 class Item:
+    __slots__ = ('owner', 'use_function', 'targeting', 'targeting_message', 'function_kwargs')
+
     def __init__(self, use_function = None, targeting = False, targeting_message = None, **kwargs):
         self.owner = None
         self.use_function = use_function
@@ -1,253 +1,192 @@
-import tcod as libtcod
-import tcod.event as libevent
-
-from map_objects.game_map import GameMap
+import os
+import time
 
-from components.fighter import Fighter
-from components.inventory import Inventory
+import tcod as libtcod
 
-from game_states import GameStates
-from game_messages import MessageLog, Message
-from entity import Entity, get_blocking_entities_at_location
-from input_handlers import handle_keys, handle_mouse
-from render_functions import clear_all, render_all, RenderOrder
+from input_handlers import handle_keys, handle_mouse, wait_for_input
+from render_functions import clear_all, render_all, render_profiler_overlay
 from fov_functions import initialize_fov, recompute_fov
-from death_functions import kill_player, kill_monster
+from camera import Camera
+from loader_functions.initialize_new_game import get_constants, get_game_variables
+from loader_functions.data_loaders import load_game, save_exists, saved_turn, delete_save
+from loader_functions.turn_journal import TurnJournal, take_snapshot, replay_journal
+from turn_functions import TurnState, play_player_turn, play_enemy_turn
+from profiler import profiler
+from game_states import GameStates
+from map_objects.level_generator import LevelPregenerator, level_settings
+from replay import InputRecorder
+from ui_widgets import UiPanel
 
 def main():
-    # console props
-    screen_width = 80
-    screen_height = 50
-
-    # UI settings
-    bar_width = 20
-    ui_panel_height = 7
-    ui_panel_y = screen_height - ui_panel_height
-    ## Message system
-    message_x = bar_width + 2
-    message_width = screen_width - bar_width - 2
-    message_height = ui_panel_height - 1
-    message_log = MessageLog(message_x, message_width, message_height)
-
-    # map props
-    map_width = 80
-    map_height = 43
-    room_max_size = 10
-    room_min_size = 6
-    max_rooms = 30
-    max_monsters_per_room = 3
-    max_items_per_room = 4
-
-    # FOV settings
-    fov_algorithm = 0
-    fov_light_walls = True
-    fov_radius = 10
-    fov_recompute = True # we don't need to recompute FOV everytime (wait, fight, use item)
-
-    # Colors dictionary
-    colors = {
-        'dark_wall': libtcod.Color(0, 0, 100),
-        'dark_ground': libtcod.Color(50, 50, 150),
-        'light_wall': libtcod.Color(130, 110, 50),
-        'light_ground': libtcod.Color(200, 180, 50)
-    }
-
-    # Entities setup
-    player_fighter_comp = Fighter(30, 2, 5)
-    player_inventory_comp = Inventory(12)
-    player = Entity(0, 0, '@', libtcod.white, 'Player', True, RenderOrder.ACTOR, 
-                    player_fighter_comp, inventory=player_inventory_comp)
-    entities = [player]
-    game_state = GameStates.PLAYERS_TURN
-    previous_game_state = game_state
+    constants = get_constants()
 
-    # Consoles setup
-    libtcod.console_set_custom_font('arial10x10.png', libtcod.FONT_TYPE_GRAYSCALE | libtcod.FONT_LAYOUT_TCOD)
-    libtcod.console_init_root(screen_width, screen_height, 'First Shem RL. Thanks Tutorial', False)
-    con = libtcod.console.Console(screen_width, screen_height)
-    ui_panel = libtcod.console.Console(screen_width, ui_panel_height)
+    save_path = constants['save_path']
+
+    # Continue the saved game if there is one, with the turns journaled after the save
+    if save_exists(save_path):
+        player, entities, game_map, message_log, game_state = load_game(save_path)
+        turn_state = TurnState(game_state)
+        turn_state.turn = saved_turn(save_path)
+        replay_journal(save_path, constants, player, entities, game_map, message_log, turn_state)
+    else:
+        player, entities, game_map, message_log, game_state = get_game_variables(constants)
+        turn_state = TurnState(game_state)
 
-    # Gamemap setup
-    game_map = GameMap(map_width, map_height)
-    game_map.make_map(max_rooms, room_min_size, room_max_size, player, entities, max_monsters_per_room, max_items_per_room)
+    # Every input is journaled, the full save is only made every snapshot_interval turns
+    journal = TurnJournal(save_path)
+    seed = take_snapshot(save_path, journal, player, entities, game_map, message_log, turn_state)
+    turn_state.results = []
+
+    # The session is recorded from the snapshot it starts with, so replay.py can play it again
+    recorder = None
+    if constants['recordings_path']:
+        recorder = InputRecorder(os.path.join(constants['recordings_path'],
+                                              time.strftime('session-%Y%m%d-%H%M%S')))
+        recorder.start(save_path, turn_state.turn, seed)
+
+    profiler.enabled = constants['profiler_enabled']
+
+    # Next levels are generated in the background once going down starts, from then on it is instant
+    level_pregenerator = LevelPregenerator(game_map.seed, level_settings(constants), constants['levels_ahead'])
+
+    # Consoles setup
+    tileset = libtcod.tileset.load_tilesheet('arial10x10.png', 32, 8, libtcod.tileset.CHARMAP_TCOD)
+    # The context is the window: it shows the root console and turns mouse pixels into its tiles
+    context = libtcod.context.new(columns=constants['screen_width'], rows=constants['screen_height'], tileset=tileset,
+                                  title=constants['window_title'])
+    root = libtcod.console.Console(constants['screen_width'], constants['screen_height'], order='F')
+    # order='F' makes the console arrays [x, y] like the map arrays
+    con = libtcod.console.Console(constants['screen_width'], constants['screen_height'], order='F')
+    ui_panel = UiPanel(constants['screen_width'], constants['ui_panel_height'], constants['bar_width'],
+                       constants['message_x'], constants['message_width'], constants['message_height'])
 
     fov_map = initialize_fov(game_map)
 
+    # The map may be bigger than the screen, only the part around the player is drawn
+    camera = Camera(constants['screen_width'], constants['screen_height'] - constants['ui_panel_height'])
+
     # Input setup
     key = libtcod.Key()
     mouse = libtcod.Mouse()
 
-    targeting_item = None
+    # Nothing is drawn until something changes: the loop sleeps in wait_for_input while idle
+    redraw = True
+    # The whole map view is drawn again only at the start and when the camera moves
+    redraw_map = True
 
-    # WARN Check tcod.event for QUIT events
-    while not libtcod.console_is_window_closed():
-        libtcod.sys_check_for_event(libtcod.EVENT_KEY_PRESS | libtcod.EVENT_MOUSE, key, mouse)        
+    while True:
+        if turn_state.fov_recompute:
+            with profiler.phase('fov'):
+                recompute_fov(fov_map, player.x, player.y, constants['fov_radius'], constants['fov_light_walls'],
+                              constants['fov_algorithm'])
+                if camera.follow(player.x, player.y, game_map.width, game_map.height):
+                    redraw_map = True
 
-        if fov_recompute:
-            recompute_fov(fov_map, player.x, player.y, fov_radius, fov_light_walls, fov_algorithm)
+        if redraw or turn_state.fov_recompute:
+            with profiler.phase('render'):
+                render_all(con, root, entities, player, game_map, camera, fov_map, turn_state.fov_recompute,
+                           constants['screen_width'], constants['screen_height'], ui_panel, constants['ui_panel_y'],
+                           message_log, mouse, turn_state.game_state, constants['colors'], redraw_map)
 
-        render_all(con, entities, player, game_map, fov_map, fov_recompute, screen_width, screen_height, 
-                    ui_panel, bar_width, ui_panel_height, ui_panel_y, message_log, mouse, game_state, colors)
+                if profiler.enabled:
+                    render_profiler_overlay(root, profiler, constants['screen_width'])
 
-        fov_recompute = False
+            turn_state.fov_recompute = False
+            redraw_map = False
 
-        libtcod.console_flush()
+            with profiler.phase('flush'):
+                context.present(root)
 
-        clear_all(con, entities)
+            clear_all(con, entities, camera)
+
+        profiler.end_frame()
+
+        input_events = wait_for_input(context, key, mouse)
+
+        # Time spent idle in wait_for_input is not a part of the frame
+        profiler.start_frame()
+
+        if input_events.get('quit'):
+            quit_game(constants, player, entities, game_map, message_log, turn_state, journal, recorder,
+                      level_pregenerator)
+            context.close()
+            return True
+
+        redraw = input_events.get('changed')
 
         # Input handling
-        action = handle_keys(key, game_state)
-        mouse_action = handle_mouse(mouse)
-
-        move = action.get('move')
-        exit = action.get('exit')
-        pickup = action.get('pickup')
-        show_inventory = action.get('show_inventory')
-        drop_inventory = action.get('drop_inventory')
-        inventory_index = action.get('inventory_index')
-        fullscreen = action.get('fullscreen')
-
-        left_click = mouse_action.get('left_click')
-        right_click = mouse_action.get('right_click')
-
-        player_turn_results = []
-
-        # Movement handling
-        if move and game_state == GameStates.PLAYERS_TURN:
-            dx, dy = move
-            dest_x = player.x + dx
-            dest_y = player.y + dy
-
-            if not game_map.is_blocked(dest_x, dest_y):
-                target = get_blocking_entities_at_location(entities, dest_x, dest_y)
-
-                if target:
-                    attack_results = player.fighter.attack(target)
-                    player_turn_results.extend(attack_results)
-                else:
-                    player.move(dx, dy)
-                    fov_recompute = True
-
-            game_state = GameStates.ENEMY_TURN
-        # Pickup handling
-        elif pickup and game_state == GameStates.PLAYERS_TURN:
-            for entity in entities:
-                if entity.item and entity.x == player.x and entity.y == player.y:
-                    pickup_results = player.inventory.add_item(entity)
-                    player_turn_results.extend(pickup_results)
-
-                    break
-            else:
-                message_log.add_message(Message('There is nothing here to pickup', libtcod.yellow))
-
-        # Menus display handling
-        if show_inventory:
-            previous_game_state = game_state
-            game_state = GameStates.SHOW_INVENTORY
-        if drop_inventory:
-            previous_game_state = game_state
-            game_state = GameStates.DROP_INVENTORY
-
-        # Items usage handling
-        if inventory_index is not None and previous_game_state != GameStates.PLAYER_DEAD and inventory_index < len(player.inventory.items):
-            item = player.inventory.items[inventory_index]
-            if game_state == GameStates.SHOW_INVENTORY:
-                player_turn_results.extend(player.inventory.use(item, entities=entities, fov_map=fov_map))
-            elif game_state == GameStates.DROP_INVENTORY:
-                player_turn_results.extend(player.inventory.drop_item(item))
-
-        if game_state == GameStates.TARGETING:
-            if left_click:
-                target_x, target_y = left_click
-
-                item_use_results = player.inventory.use(targeting_item, entities=entities, fov_map=fov_map,
-                                                        target_x=target_x, target_y=target_y)
-                player_turn_results.extend(item_use_results)
-            elif right_click:
-                player_turn_results.append({'targeting_cancelled': True})
+        with profiler.phase('input'):
+            action = handle_keys(key, turn_state.game_state)
+            mouse_action = handle_mouse(mouse, camera)
+
+        if action.get('fullscreen'):
+            context.sdl_window.fullscreen = not context.sdl_window.fullscreen
+
+        # Inventory menus open on their first page, letters pick items on the page shown
+        if action.get('show_inventory') or action.get('drop_inventory'):
+            ui_panel.inventory_menu.page = 0
+
+        if action.get('menu_page'):
+            ui_panel.inventory_menu.turn_page(action['menu_page'])
+            redraw = True
+
+        if action.get('inventory_index') is not None:
+            action['inventory_index'] = ui_panel.inventory_menu.item_index(action['inventory_index'])
+
+        scroll_log = action.get('scroll_log')
+        if scroll_log:
+            # A page at a time
+            message_log.scroll_by(scroll_log * message_log.height)
+            redraw = True
+
+        if action.get('toggle_profiler'):
+            profiler.toggle()
+
+        if action.get('dump_profile') and profiler.enabled:
+            profiler.dump(constants['profiler_dump_path'])
+
+        # Player turn, then the monsters answer
+        with profiler.phase('player_turn'):
+            exit = play_player_turn(action, mouse_action, player, entities, game_map, fov_map, message_log, turn_state)
 
         if exit:
-            if game_state in (GameStates.SHOW_INVENTORY, GameStates.DROP_INVENTORY):
-                game_state = previous_game_state
-            elif game_state == GameStates.TARGETING:
-                player_turn_results.append({'targeting_cancelled': True})
-            else:
-                return True
-
-        if fullscreen:
-            libtcod.console_set_fullscreen(not libtcod.console_is_fullscreen)
-
-        # Print turn results
-        for p_t_result in player_turn_results:
-            message = p_t_result.get('message')
-            dead_entity = p_t_result.get('dead')
-            item_added =p_t_result.get('item_added')
-            item_consumed = p_t_result.get('item_consumed')
-            item_dropped = p_t_result.get('item_dropped')
-            targeting = p_t_result.get('targeting')
-            targeting_cancelled = p_t_result.get('targeting_cancelled')
-
-            if message:
-                message_log.add_message(message)
-
-            if dead_entity:
-                if dead_entity == player:
-                    message, game_state = kill_player(dead_entity)
-                else:
-                    message = kill_monster(dead_entity)
-                message_log.add_message(message)
-
-            if item_added:
-                entities.remove(item_added)
-                game_state = GameStates.ENEMY_TURN
-
-            if item_consumed:
-                game_state = GameStates.ENEMY_TURN
-
-            if targeting:
-                previous_game_state = GameStates.PLAYERS_TURN
-                game_state = GameStates.TARGETING
-
-                targeting_item = targeting
-
-                message_log.add_message(targeting_item.item.targeting_message)
-
-            if targeting_cancelled:
-                game_state = previous_game_state
-
-                message_log.add_message(Message('Targeting cancelled'))
-
-            if item_dropped:
-                entities.append(item_dropped)
-                game_state = GameStates.ENEMY_TURN
-
-        # ENEMIES TURN
-        if game_state == GameStates.ENEMY_TURN:
-            for entity in entities:
-                if entity.ai:
-                    enemy_turn_results = entity.ai.take_turn(player, fov_map, game_map, entities)
-
-                    for e_t_result in enemy_turn_results:
-                        message = e_t_result.get('message')
-                        dead_entity = e_t_result.get('dead')
-
-                        if message:
-                            message_log.add_message(message)
-
-                        if dead_entity:
-                            if dead_entity == player:
-                                message, game_state = kill_player(dead_entity)
-                            else:
-                                message = kill_monster(dead_entity)
-
-                            message_log.add_message(message)
-
-                            if game_state == GameStates.PLAYER_DEAD:
-                                break
-                    if game_state == GameStates.PLAYER_DEAD:
-                        break
-            else:
-                game_state = GameStates.PLAYERS_TURN
+            quit_game(constants, player, entities, game_map, message_log, turn_state, journal, recorder,
+                      level_pregenerator)
+            context.close()
+            return True
+
+        with profiler.phase('enemy_turn'):
+            play_enemy_turn(player, entities, game_map, fov_map, message_log, turn_state, constants['ai_distance_map'],
+                            constants['monster_wake_radius'])
+
+        with profiler.phase('journal'):
+            if action or mouse_action:
+                journal.record(action, mouse_action, turn_state.results)
+                if recorder:
+                    recorder.record(action, mouse_action, turn_state.results)
+            turn_state.results.clear()
+
+            if (turn_state.game_state == GameStates.PLAYERS_TURN and
+                    turn_state.turn - journal.turn >= constants['snapshot_interval']):
+                seed = take_snapshot(save_path, journal, player, entities, game_map, message_log, turn_state)
+                if recorder:
+                    recorder.snapshot(seed)
+
+def quit_game(constants, player, entities, game_map, message_log, turn_state, journal, recorder, level_pregenerator):
+    if profiler.enabled:
+        profiler.dump(constants['profiler_dump_path'])
+    level_pregenerator.shutdown()
+
+    if recorder:
+        recorder.close()
+
+    # A dead player's game is over, there is nothing to continue
+    if GameStates.PLAYER_DEAD in (turn_state.game_state, turn_state.previous_game_state):
+        journal.close()
+        delete_save(constants['save_path'])
+    else:
+        take_snapshot(constants['save_path'], journal, player, entities, game_map, message_log, turn_state)
+        journal.close()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,15 +1,26 @@
 import math
-import tcod as libtcod
 
 from render_functions import RenderOrder
+from entity_index import EntityIndex
+
+# RenderOrder by value, the store keeps only the value
+RENDER_ORDERS = {render_order.value: render_order for render_order in RenderOrder}
 
 class Entity:
     """
-    A generic object to represent everything in a game
+    A generic object to represent everything in a game.
+    On a level its position, flags and fighter stats live in the level's EntityStore (self.store, row self.slot),
+    the attributes below read and write them there. Out of any level (in an inventory) it keeps them itself
     """
+    __slots__ = ('_x', '_y', 'char', 'color', 'name', '_blocks', '_render_order', '_fighter', '_ai', 'item',
+                 'inventory', 'speed', 'entity_index', 'store', 'slot')
+
     def __init__(self, x, y, char, color, name, 
                 blocks = False, render_order = RenderOrder.CORPSE, 
-                fighter = None, ai = None, item = None, inventory = None):
+                fighter = None, ai = None, item = None, inventory = None, speed = 100):
+        self.store = None
+        self.slot = None
+
         self.x = x
         self.y = y
         self.char = char
@@ -21,12 +32,11 @@ class Entity:
         self.ai = ai
         self.item = item
         self.inventory = inventory
+        # 100 - one action per player action, 200 - two of them
+        self.speed = speed
 
-        if self.fighter:
-            self.fighter.owner = self
-        
-        if self.ai:
-            self.ai.owner = self
+        # Set by the EntityIndex the entity is added to
+        self.entity_index = None
 
         if self.item:
             self.item.owner = self
@@ -34,10 +44,100 @@ class Entity:
         if self.inventory:
             self.inventory.owner = self
 
+    @property
+    def x(self):
+        store = self.store
+        return self._x if store is None else store.x[self.slot]
+
+    @x.setter
+    def x(self, value):
+        store = self.store
+        if store is None:
+            self._x = value
+        else:
+            store.x[self.slot] = value
+
+    @property
+    def y(self):
+        store = self.store
+        return self._y if store is None else store.y[self.slot]
+
+    @y.setter
+    def y(self, value):
+        store = self.store
+        if store is None:
+            self._y = value
+        else:
+            store.y[self.slot] = value
+
+    @property
+    def blocks(self):
+        store = self.store
+        return self._blocks if store is None else bool(store.blocks[self.slot])
+
+    @blocks.setter
+    def blocks(self, value):
+        store = self.store
+        if store is None:
+            self._blocks = value
+        else:
+            store.blocks[self.slot] = value
+
+    @property
+    def render_order(self):
+        store = self.store
+        return self._render_order if store is None else RENDER_ORDERS[store.render_order[self.slot]]
+
+    @render_order.setter
+    def render_order(self, value):
+        store = self.store
+        if store is None:
+            self._render_order = value
+        else:
+            store.render_order[self.slot] = value.value
+
+    @property
+    def fighter(self):
+        return self._fighter
+
+    @fighter.setter
+    def fighter(self, fighter):
+        # Stats are read before the fighter is attached: afterwards they would be read from our row
+        values = None
+        if fighter is not None:
+            values = (fighter.hp, fighter.max_hp, fighter.defense, fighter.power)
+            fighter.owner = self
+
+        self._fighter = fighter
+
+        if self.store is not None:
+            self.store.set_fighter(self.slot, values)
+
+    @property
+    def ai(self):
+        return self._ai
+
+    @ai.setter
+    def ai(self, ai):
+        if ai is not None:
+            ai.owner = self
+
+        self._ai = ai
+
+        if self.store is not None:
+            self.store.has_ai[self.slot] = ai is not None
+
     def move(self, dx, dy):
         # Move entity by a given amount
-        self.x += dx
-        self.y += dy
+        self.set_position(self.x + dx, self.y + dy)
+
+    def set_position(self, x, y):
+        # Every position change goes through here, so the entities index always knows where we are
+        if self.entity_index is not None:
+            self.entity_index.relocate(self, x, y)
+
+        self.x = x
+        self.y = y
 
     def move_towards(self, target_x, target_y, game_map, entities):
         dx = target_x - self.x
@@ -49,50 +149,39 @@ class Entity:
 
         if not (game_map.is_blocked(self.x + dx, self.y + dy) or 
                 get_blocking_entities_at_location(entities, self.x + dx, self.y + dy)):
+            if self.blocks:
+                game_map.pathfinder.move_entity(self.x, self.y, self.x + dx, self.y + dy)
+            # Off the remembered path (if there is one)
+            game_map.pathfinder.forget(self)
             self.move(dx, dy)
 
     def move_astar(self, target, entities, game_map):
-        # Create a FOV map that has the dimensions of the map
-        fov = libtcod.map_new(game_map.width, game_map.height)
-
-        # Scan the current map each turn and set all the walls as unwalkable
-        for y1 in range(game_map.height):
-            for x1 in range(game_map.width):
-                libtcod.map_set_properties(fov, x1, y1, not game_map.tiles[x1][y1].block_sight,
-                                           not game_map.tiles[x1][y1].blocked)
-
-        # Scan all the objects to see if there are objects that must be navigated around
-        # Check also that the object isn't self or the target (so that the start and the end points are free)
-        # The AI class handles the situation if self is next to the target so it will not use this A* function anyway
-        for entity in entities:
-            if entity.blocks and entity != self and entity != target:
-                # Set the tile as a wall so it must be navigated around
-                libtcod.map_set_properties(fov, entity.x, entity.y, True, False)
-
-        # Allocate a A* path
-        # The 1.41 is the normal diagonal cost of moving, it can be set as 0.0 if diagonal moves are prohibited
-        my_path = libtcod.path_new_using_map(fov, 1.41)
-
-        # Compute the path between self's coordinates and the target's coordinates
-        libtcod.path_compute(my_path, self.x, self.y, target.x, target.y)
-
-        # Check if the path exists, and in this case, also the path is shorter than 25 tiles
-        # The path size matters if you want the monster to use alternative longer paths (for example through other rooms) if for example the player is in a corridor
-        # It makes sense to keep path size relatively low to keep the monsters from running around the map if there's an alternative path really far away
-        if not libtcod.path_is_empty(my_path) and libtcod.path_size(my_path) < 25:
-            # Find the next coordinates in the computed full path
-            x, y = libtcod.path_walk(my_path, True)
-            if x or y:
-                # Set self's coordinates to the next path tile
-                self.x = x
-                self.y = y
+        # The map pathfinder keeps the cost grid and remembers our path between turns,
+        # so the path is only recomputed when it gets blocked or the target leaves it
+        step = game_map.pathfinder.next_step(self, target)
+
+        if step:
+            x, y = step
+            game_map.pathfinder.move_entity(self.x, self.y, x, y)
+            # Set self's coordinates to the next path tile
+            self.set_position(x, y)
         else:
             # Keep the old move function as a backup so that if there are no paths (for example another monster blocks a corridor)
             # it will still try to move towards the player (closer to the corridor opening)
             self.move_towards(target.x, target.y, game_map, entities)
 
-            # Delete the path to free memory
-        libtcod.path_delete(my_path)
+    def move_downhill(self, target, entities, game_map):
+        # Step down the shared distance map towards the point it was computed from (the player)
+        step = game_map.pathfinder.downhill_step(self)
+
+        if step:
+            x, y = step
+            game_map.pathfinder.move_entity(self.x, self.y, x, y)
+            game_map.pathfinder.forget(self)
+            self.set_position(x, y)
+        else:
+            # Same backup as in move_astar: there is no free way down, so just try to get closer
+            self.move_towards(target.x, target.y, game_map, entities)
 
     def distance(self, x, y):
         return math.sqrt((x - self.x) ** 2 + (y - self.y) ** 2)
@@ -103,6 +192,9 @@ class Entity:
         return math.sqrt(dx ** 2 + dy ** 2)
 
 def get_blocking_entities_at_location(entities, dest_x, dest_y):
+    if isinstance(entities, EntityIndex):
+        return entities.blocking_at(dest_x, dest_y)
+
     for entity in entities:
         if entity.blocks and entity.x == dest_x and entity.y == dest_y:
             return entity
@@ -0,0 +1,88 @@
+import json
+import os
+
+import tcod as libtcod
+
+from components.fighter import Fighter
+from components.ai import BasicMonster
+from components.item import Item
+
+import item_functions
+from entity import Entity
+from render_functions import RenderOrder
+from game_messages import Message
+
+ENTITIES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'entities.json')
+
+AI_CLASSES = {'BasicMonster': BasicMonster}
+
+class EntityPrototype:
+    """
+    One kind of entity as the data file describes it. What never changes (char, color, name, item function,
+    its arguments and targeting message) is made once and shared by every entity of that kind,
+    a spawn only makes the parts with their own state: fighter, AI and item
+    """
+    def __init__(self, data):
+        self.char = data['char']
+        self.color = parse_color(data['color'])
+        self.name = data['name']
+        self.blocks = data.get('blocks', False)
+        self.render_order = RenderOrder[data['render_order']]
+        self.speed = data.get('speed', 100)
+
+        fighter = data.get('fighter')
+        self.fighter = (fighter['hp'], fighter['defense'], fighter['power']) if fighter else None
+
+        self.ai_class = AI_CLASSES[data['ai']] if data.get('ai') else None
+
+        item = data.get('item')
+        self.item = item is not None
+        if item:
+            self.use_function = getattr(item_functions, item['use_function']) if item.get('use_function') else None
+            self.targeting = item.get('targeting', False)
+            self.targeting_message = None
+            if item.get('targeting_message'):
+                text, color = item['targeting_message']
+                self.targeting_message = Message(text, parse_color(color))
+            self.function_kwargs = item.get('kwargs', {})
+
+    def spawn(self, x, y):
+        fighter = Fighter(*self.fighter) if self.fighter else None
+        ai = self.ai_class() if self.ai_class else None
+        item = None
+        if self.item:
+            item = Item(self.use_function, self.targeting, self.targeting_message, **self.function_kwargs)
+
+        return Entity(x, y, self.char, self.color, self.name, self.blocks, self.render_order, fighter, ai, item,
+                      speed=self.speed)
+
+def parse_color(color):
+    # A libtcod color name ("violet") or [r, g, b]
+    if isinstance(color, str):
+        return getattr(libtcod, color)
+
+    return libtcod.Color(*color)
+
+def load_prototypes(path = ENTITIES_PATH):
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+
+    return {name: EntityPrototype(description) for name, description in data.items()}
+
+# Read once per process, the first time an entity is made
+prototypes = None
+
+def create_entity(name, x, y):
+    """
+    Makes a monster or an item by its spawn name. Level generation only decides names and places,
+    so it can run anywhere (another process too) and entities are created here afterwards
+    """
+    global prototypes
+    if prototypes is None:
+        prototypes = load_prototypes()
+
+    prototype = prototypes.get(name)
+    if prototype is None:
+        raise ValueError('Unknown entity name: {0}'.format(name))
+
+    return prototype.spawn(x, y)
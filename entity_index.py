@@ -0,0 +1,110 @@
+from entity_store import EntityStore
+from profiler import profiler
+
+class EntityIndex(list):
+    """
+    The entities list that also knows who stands on which tile.
+    Entities keep it up to date themselves through Entity.set_position,
+    adding/removing them (pickup, drop) goes through append/remove as before.
+    Entities in it keep their data in its EntityStore (self.store)
+    """
+    def __init__(self, entities = ()):
+        super().__init__()
+        self.store = EntityStore()
+
+        # (x, y) -> [entity, ...]
+        self.cells = {}
+
+        self.extend(entities)
+
+    def append(self, entity):
+        # An entity is on one level at a time: its data can only live in one store
+        if entity.entity_index is not None:
+            entity.entity_index.remove(entity)
+
+        super().append(entity)
+        self.store.add(entity)
+        self._add_to_cell(entity, entity.x, entity.y)
+        entity.entity_index = self
+
+    def extend(self, entities):
+        for entity in entities:
+            self.append(entity)
+
+    def remove(self, entity):
+        super().remove(entity)
+        self._remove_from_cell(entity, entity.x, entity.y)
+        self.store.remove(entity)
+        entity.entity_index = None
+
+    def clear(self):
+        for entity in self:
+            entity.entity_index = None
+
+        super().clear()
+        self.cells.clear()
+        self.store.clear()
+
+    def relocate(self, entity, x, y):
+        # Called by the entity right before its coordinates change
+        self._remove_from_cell(entity, entity.x, entity.y)
+        self._add_to_cell(entity, x, y)
+
+    def order_cells(self, key):
+        # Puts the entities of every tile in order, loading a game uses it to restore the order they came there in
+        for cell in self.cells.values():
+            if len(cell) > 1:
+                cell.sort(key=key)
+
+    def at(self, x, y):
+        return self.cells.get((x, y), ())
+
+    def blocking_at(self, x, y):
+        if profiler.enabled:
+            profiler.count('entities_scanned', len(self.cells.get((x, y), ())))
+
+        for entity in self.cells.get((x, y), ()):
+            if entity.blocks:
+                return entity
+
+        return None
+
+    def in_radius(self, x, y, radius):
+        """
+        All entities not farther than radius from (x, y)
+        """
+        results = []
+        r = int(radius)
+        radius_sq = radius ** 2
+
+        # Small areas are cheaper to walk tile by tile, big ones - through occupied tiles only
+        if (2 * r + 1) ** 2 <= len(self.cells):
+            for cx in range(x - r, x + r + 1):
+                for cy in range(y - r, y + r + 1):
+                    cell = self.cells.get((cx, cy))
+                    if cell and (cx - x) ** 2 + (cy - y) ** 2 <= radius_sq:
+                        results.extend(cell)
+        else:
+            for (cx, cy), cell in self.cells.items():
+                if (cx - x) ** 2 + (cy - y) ** 2 <= radius_sq:
+                    results.extend(cell)
+
+        if profiler.enabled:
+            profiler.count('entities_scanned', len(results))
+
+        return results
+
+    def _add_to_cell(self, entity, x, y):
+        cell = self.cells.get((x, y))
+
+        if cell is None:
+            self.cells[(x, y)] = [entity]
+        else:
+            cell.append(entity)
+
+    def _remove_from_cell(self, entity, x, y):
+        cell = self.cells[(x, y)]
+        cell.remove(entity)
+
+        if not cell:
+            del self.cells[(x, y)]
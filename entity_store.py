@@ -0,0 +1,104 @@
+from array import array
+
+import numpy as np
+
+# Column name -> array type code. One row per entity, the row number is the entity's slot
+COLUMNS = (
+    ('x', 'i'),
+    ('y', 'i'),
+    ('blocks', 'b'),
+    ('render_order', 'b'),
+    ('has_ai', 'b'),
+    ('fighter', 'b'), # the four below only mean something where this is set
+    ('hp', 'i'),
+    ('max_hp', 'i'),
+    ('defense', 'i'),
+    ('power', 'i')
+)
+
+NUMPY_TYPES = {'i': np.int32, 'b': np.int8}
+
+class EntityStore:
+    """
+    The data of entities on a level kept column by column (struct of arrays) instead of in every Entity.
+    Entity and Fighter read and write their rows through properties, and whole-level systems can take
+    a column as a numpy array and work on all entities at once.
+    Columns are plain arrays, so reading one value gives a python int and costs no more than an attribute
+    """
+    def __init__(self):
+        for name, type_code in COLUMNS:
+            setattr(self, name, array(type_code))
+
+        # slot -> entity, in the order they were added
+        self.entities = []
+
+    def __len__(self):
+        return len(self.entities)
+
+    def add(self, entity):
+        # Values move from the entity into a new row at the end
+        fighter = entity.fighter
+
+        self.x.append(entity.x)
+        self.y.append(entity.y)
+        self.blocks.append(entity.blocks)
+        self.render_order.append(entity.render_order.value)
+        self.has_ai.append(entity.ai is not None)
+        self.fighter.append(fighter is not None)
+        self.hp.append(fighter.hp if fighter else 0)
+        self.max_hp.append(fighter.max_hp if fighter else 0)
+        self.defense.append(fighter.defense if fighter else 0)
+        self.power.append(fighter.power if fighter else 0)
+
+        entity.slot = len(self.entities)
+        entity.store = self
+        # Copies left in the entity are stale from now on, no need to keep them alive
+        entity._x = entity._y = None
+        self.entities.append(entity)
+
+    def remove(self, entity):
+        # Values go back into the entity. Rows after it move up one place, so slot order stays
+        # the order entities were added in (the same as the entities list)
+        slot = entity.slot
+        fighter = entity.fighter
+        values = (entity.x, entity.y, entity.blocks, entity.render_order)
+        if fighter:
+            fighter_values = (fighter.hp, fighter.max_hp, fighter.defense, fighter.power)
+
+        entity.store = None
+        entity.slot = None
+        entity.x, entity.y, entity.blocks, entity.render_order = values
+        if fighter:
+            fighter.hp, fighter.max_hp, fighter.defense, fighter.power = fighter_values
+
+        for name, _ in COLUMNS:
+            del getattr(self, name)[slot]
+        del self.entities[slot]
+
+        for moved in self.entities[slot:]:
+            moved.slot -= 1
+
+    def clear(self):
+        for entity in list(self.entities):
+            self.remove(entity)
+
+    def set_fighter(self, slot, fighter_values):
+        # fighter_values - (hp, max_hp, defense, power), or None when the entity loses its fighter
+        if fighter_values is None:
+            self.fighter[slot] = False
+        else:
+            self.fighter[slot] = True
+            self.hp[slot], self.max_hp[slot], self.defense[slot], self.power[slot] = fighter_values
+
+    def column(self, name):
+        """
+        A column as a numpy array sharing the memory, writes go straight into the store.
+        Use it right away: the store can't grow while such an array exists
+        """
+        column = getattr(self, name)
+        dtype = NUMPY_TYPES[column.typecode]
+
+        if not column:
+            return np.zeros(0, dtype=dtype)
+
+        return np.frombuffer(column, dtype=dtype)
@@ -1,13 +1,82 @@
+import numpy as np
 import tcod as libtcod
 
-def initialize_fov(game_map):
-    fov_map = libtcod.map_new(game_map.width, game_map.height)
+NO_TILES = (np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp))
+
+class FovMap(libtcod.map.Map):
+    """
+    tcod FOV map that remembers what the last computation changed. fov is the visibility mask, [x, y] like
+    every map array, and everybody (render, explored, monsters waking up, item targeting) reads it.
+    became_visible and became_hidden are the (xs, ys) of the tiles that changed in the last computation,
+    version counts the computations. A skipped computation changes neither: the deltas always belong to version
+    """
+    def __init__(self, width, height, explored):
+        super().__init__(width, height, order='F')
+        # Tiles come into explored as soon as they are seen, drawn or not
+        self.explored = explored
+
+        # (x, y, radius, light_walls, algorithm) of the last computation, None when tiles changed since
+        self.computed = None
+        self.version = 0
+        self.became_visible = NO_TILES
+        self.became_hidden = NO_TILES
+        # Part of the map the last FOV can reach
+        self.bounds = (slice(0, 0), slice(0, 0))
+
+    def recompute(self, x, y, radius, light_walls = True, algorithm = 0):
+        """
+        Computes FOV from (x, y) again, unless nothing changed since the last time.
+        Returns True if it did
+        """
+        key = (x, y, radius, light_walls, algorithm)
+        if key == self.computed:
+            # Readers compare versions: clearing the deltas here would lose them for whoever hasn't seen them yet
+            return False
+
+        old_xs, old_ys = self.bounds
+        before = self.fov[old_xs, old_ys].copy()
+
+        self.compute_fov(x, y, radius, light_walls, algorithm)
+        self.computed = key
+
+        # Nothing outside the radius is visible, the changes are looked for only where either FOV can reach
+        if radius > 0:
+            new_xs = slice(max(x - radius, 0), min(x + radius + 1, self.width))
+            new_ys = slice(max(y - radius, 0), min(y + radius + 1, self.height))
+        else:
+            new_xs, new_ys = slice(0, self.width), slice(0, self.height)
+        self.bounds = (new_xs, new_ys)
 
-    for y in range(game_map.height):
-        for x in range(game_map.width):
-            libtcod.map_set_properties(fov_map, x, y, not game_map.tiles[x][y].block_sight, not game_map.tiles[x][y].blocked)
+        if before.size:
+            box_xs = slice(min(old_xs.start, new_xs.start), max(old_xs.stop, new_xs.stop))
+            box_ys = slice(min(old_ys.start, new_ys.start), max(old_ys.stop, new_ys.stop))
+        else:
+            box_xs, box_ys = new_xs, new_ys
 
-    return fov_map
+        after = self.fov[box_xs, box_ys]
+        was_visible = np.zeros(after.shape, dtype=np.bool_)
+        was_visible[old_xs.start - box_xs.start:old_xs.stop - box_xs.start,
+                    old_ys.start - box_ys.start:old_ys.stop - box_ys.start] = before
+
+        self.became_visible = offset_tiles(np.nonzero(after & ~was_visible), box_xs.start, box_ys.start)
+        self.became_hidden = offset_tiles(np.nonzero(was_visible & ~after), box_xs.start, box_ys.start)
+        self.explored[box_xs, box_ys] |= after
+        self.version += 1
+
+        return True
+
+    def tiles_changed(self):
+        # Walls moved: the same origin may see something else now
+        self.computed = None
+
+def offset_tiles(tiles, x, y):
+    xs, ys = tiles
+    return (xs + x, ys + y)
+
+def initialize_fov(game_map):
+    # The game map tiles are stored inside its FOV map already, so there is nothing to copy
+    return game_map.fov_map
 
 def recompute_fov(fov_map, x, y, radius, light_walls = True, algorithm = 0):
-    libtcod.map_compute_fov(fov_map, x, y, radius, light_walls, algorithm)
\ No newline at end of file
+    # Returns True if the FOV really had to be computed again (see FovMap.recompute)
+    return fov_map.recompute(x, y, radius, light_walls, algorithm)
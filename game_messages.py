@@ -1,27 +1,84 @@
 import tcod as libtcod
 
 import textwrap
+from collections import deque
 
 class Message:
+    __slots__ = ('text', 'color')
+
     def __init__(self, text, color = libtcod.white):
         self.text = text
         self.color = color
 
+class LoggedMessage:
+    """
+    A message as the log keeps it: the same message repeated in a row is kept once with a counter.
+    Message objects may be shared (item templates), so the log never changes them
+    """
+    __slots__ = ('text', 'color', 'count', 'lines')
+
+    def __init__(self, text, color, count = 1):
+        self.text = text
+        self.color = color
+        self.count = count
+        # Wrapped lines, made the first time the message is shown
+        self.lines = None
+
+    def wrapped(self, width):
+        if self.lines is None:
+            text = self.text if self.count == 1 else '{0} x{1}'.format(self.text, self.count)
+            self.lines = textwrap.wrap(text, width)
+
+        return self.lines
+
 class MessageLog:
-    def __init__(self, x, width, height):
-        self.messages = []
+    """
+    The last capacity messages, oldest first. Lines are wrapped only for the messages on the screen.
+    scroll - lines the panel is scrolled back from the newest one
+    """
+    def __init__(self, x, width, height, capacity = 1000):
+        # A full deque drops its oldest message by itself, in O(1)
+        self.messages = deque(maxlen=capacity)
         self.x = x
         self.width = width
         self.height = height
+        self.scroll = 0
+        # Goes up whenever what the panel shows may have changed
+        self.version = 0
 
     def add_message(self, message):
-        # Split the message if necessary among multilines
-        new_msg_lines = textwrap.wrap(message.text, self.width)
+        last = self.messages[-1] if self.messages else None
+
+        if last and last.text == message.text and last.color == message.color:
+            last.count += 1
+            last.lines = None
+        else:
+            self.messages.append(LoggedMessage(message.text, message.color))
+
+        # Something new happened, show it
+        self.scroll = 0
+        self.version += 1
+
+    def scroll_by(self, lines):
+        # Positive goes back in history. Clamped to the oldest line when the panel is drawn
+        self.scroll = max(self.scroll + lines, 0)
+        self.version += 1
+
+    def visible_lines(self):
+        """
+        (text, color) of the lines in the panel, top to bottom
+        """
+        needed = self.scroll + self.height
+        # Newest line first, only as many messages are wrapped as it takes to fill the panel
+        lines = []
+        for message in reversed(self.messages):
+            for text in reversed(message.wrapped(self.width)):
+                lines.append((text, message.color))
+            if len(lines) >= needed:
+                break
 
-        for line in new_msg_lines:
-            # If the buffer is full, remove the first line to make room for the new one
-            if len(self.messages) == self.height:
-                del self.messages[0]
+        self.scroll = min(self.scroll, max(len(lines) - self.height, 0))
+        lines = lines[self.scroll:self.scroll + self.height]
+        lines.reverse()
 
-            # Add new line
-            self.messages.append(Message(line, message.color))
\ No newline at end of file
+        return lines
@@ -0,0 +1,107 @@
+import random
+import time
+
+from fov_functions import initialize_fov, recompute_fov
+from game_states import GameStates
+from loader_functions.initialize_new_game import get_constants, get_game_variables
+from turn_functions import TurnState, play_player_turn, play_enemy_turn
+
+MOVES = [(0, -1), (0, 1), (-1, 0), (1, 0), (-1, -1), (1, -1), (-1, 1), (1, 1)]
+
+def random_actions(rng = None):
+    """
+    Action source playing like a drunk player: mostly walks, sometimes picks up and uses items,
+    clicks random visible tiles when an item asks for a target
+    """
+    rng = rng or random.Random()
+
+    def next_action(player, entities, game_map, fov_map, turn_state):
+        if turn_state.game_state == GameStates.TARGETING:
+            # There may be nobody to target at all
+            if rng.random() < 0.2:
+                return {}, {'right_click': (player.x, player.y)}
+
+            visible_x, visible_y = fov_map.fov.nonzero()
+            i = rng.randrange(len(visible_x))
+            return {}, {'left_click': (int(visible_x[i]), int(visible_y[i]))}
+
+        if turn_state.game_state in (GameStates.SHOW_INVENTORY, GameStates.DROP_INVENTORY):
+            if player.inventory.items and rng.random() < 0.9:
+                return {'inventory_index': rng.randrange(len(player.inventory.items))}, {}
+            return {'exit': True}, {}
+
+        roll = rng.random()
+        if roll < 0.05:
+            return {'pickup': True}, {}
+        elif roll < 0.08 and player.inventory.items:
+            return {'show_inventory': True}, {}
+        elif roll < 0.09 and player.inventory.items:
+            return {'drop_inventory': True}, {}
+
+        return {'move': rng.choice(MOVES)}, {}
+
+    return next_action
+
+def scripted_actions(actions):
+    """
+    Action source replaying a list of (action, mouse_action) pairs. Returns None when the list is over,
+    which ends the run
+    """
+    actions = iter(actions)
+
+    def next_action(player, entities, game_map, fov_map, turn_state):
+        return next(actions, None)
+
+    return next_action
+
+def run_headless(action_source, turns, constants = None, timings = None):
+    """
+    Plays the game without a window: same turn logic as engine.main, only input comes from action_source.
+    The run ends after turns player turns, on the player's death or when action_source returns None.
+    Returns the game variables and the number of player turns played. If timings dict is given,
+    seconds spent in every phase are added to it
+    """
+    constants = constants or get_constants()
+
+    start = time.perf_counter()
+    player, entities, game_map, message_log, game_state = get_game_variables(constants)
+    fov_map = initialize_fov(game_map)
+    turn_state = TurnState(game_state)
+    add_timing(timings, 'map_generation', start)
+
+    turns_played = 0
+    while turns_played < turns and turn_state.game_state != GameStates.PLAYER_DEAD:
+        if turn_state.fov_recompute:
+            start = time.perf_counter()
+            recompute_fov(fov_map, player.x, player.y, constants['fov_radius'], constants['fov_light_walls'],
+                          constants['fov_algorithm'])
+            turn_state.fov_recompute = False
+            add_timing(timings, 'fov', start)
+
+        start = time.perf_counter()
+        next_input = action_source(player, entities, game_map, fov_map, turn_state)
+        add_timing(timings, 'input', start)
+
+        # Out of input
+        if next_input is None:
+            break
+        action, mouse_action = next_input
+
+        start = time.perf_counter()
+        if play_player_turn(action, mouse_action, player, entities, game_map, fov_map, message_log, turn_state):
+            break
+        add_timing(timings, 'player_turn', start)
+
+        if turn_state.game_state == GameStates.ENEMY_TURN:
+            start = time.perf_counter()
+            play_enemy_turn(player, entities, game_map, fov_map, message_log, turn_state, constants['ai_distance_map'],
+                            constants['monster_wake_radius'])
+            add_timing(timings, 'enemy_turn', start)
+
+            turns_played += 1
+
+    return (player, entities, game_map, message_log, turn_state), turns_played
+
+def add_timing(timings, phase, start):
+    if timings is not None:
+        timings[phase] = timings.get(phase, 0.0) + time.perf_counter() - start
@@ -1,16 +1,90 @@
 import tcod as libtcod
+import tcod.event as libevent
 
 from game_states import GameStates
 
+# SDL key symbols of tcod.event -> old libtcod key codes the handlers below check
+KEY_CODES = {
+    libevent.KeySym.UP: libtcod.KEY_UP,
+    libevent.KeySym.DOWN: libtcod.KEY_DOWN,
+    libevent.KeySym.LEFT: libtcod.KEY_LEFT,
+    libevent.KeySym.RIGHT: libtcod.KEY_RIGHT,
+    libevent.KeySym.RETURN: libtcod.KEY_ENTER,
+    libevent.KeySym.KP_ENTER: libtcod.KEY_ENTER,
+    libevent.KeySym.ESCAPE: libtcod.KEY_ESCAPE,
+    libevent.KeySym.F3: libtcod.KEY_F3,
+    libevent.KeySym.F4: libtcod.KEY_F4,
+    libevent.KeySym.PAGEUP: libtcod.KEY_PAGEUP,
+    libevent.KeySym.PAGEDOWN: libtcod.KEY_PAGEDOWN
+}
+
+def wait_for_input(context, key, mouse, timeout = None):
+    """
+    Blocks until something happens (or timeout seconds pass) and fills key and mouse
+    the same way sys_check_for_event did: at most one key press or click per call.
+    context - the window's context, it turns mouse pixels into console tiles.
+    Returns {'quit': True} on window close, {'changed': True} if the screen has to be redrawn
+    """
+    # Key and clicks only live for one frame, mouse position stays
+    key.vk = libtcod.KEY_NONE
+    key.c = 0
+    key.lalt = False
+    mouse.lbutton_pressed = False
+    mouse.rbutton_pressed = False
+
+    changed = False
+
+    for event in libevent.wait(timeout):
+        if isinstance(event, libevent.Quit):
+            return {'quit': True}
+        elif isinstance(event, libevent.KeyDown):
+            sym = int(event.sym)
+            key.vk = KEY_CODES.get(sym, libtcod.KEY_CHAR if sym < 128 else libtcod.KEY_NONE)
+            key.c = sym if sym < 128 else 0
+            key.lalt = bool(event.mod & libevent.Modifier.LALT)
+            # One key per frame, the rest stays in the queue for the next one
+            return {'changed': True}
+        elif isinstance(event, libevent.MouseMotion):
+            (x, y) = context.convert_event(event).integer_position
+            if (x, y) != (mouse.cx, mouse.cy):
+                mouse.cx = x
+                mouse.cy = y
+                # Hover names must follow the mouse
+                changed = True
+        elif isinstance(event, libevent.MouseButtonUp):
+            # libtcod counted a button as pressed when it was released
+            (mouse.cx, mouse.cy) = context.convert_event(event).integer_position
+            mouse.lbutton_pressed = event.button == libevent.MouseButton.LEFT
+            mouse.rbutton_pressed = event.button == libevent.MouseButton.RIGHT
+            return {'changed': True}
+        elif isinstance(event, libevent.WindowEvent):
+            # Exposed, resized, restored - show the last frame again
+            changed = True
+
+    return {'changed': changed}
+
 def handle_keys(key, game_state):
+    # Profiling keys work in any state
+    if key.vk == libtcod.KEY_F3:
+        return {'toggle_profiler': True}
+    elif key.vk == libtcod.KEY_F4:
+        return {'dump_profile': True}
+
+    if game_state in (GameStates.SHOW_INVENTORY, GameStates.DROP_INVENTORY):
+        return handle_keys_inventory(key)
+
+    # Message history works in the other states too
+    if key.vk == libtcod.KEY_PAGEUP:
+        return {'scroll_log': 1}
+    elif key.vk == libtcod.KEY_PAGEDOWN:
+        return {'scroll_log': -1}
+
     if game_state == GameStates.PLAYERS_TURN:
         return handle_keys_player_turn(key)
     elif game_state == GameStates.PLAYER_DEAD:
         return handle_keys_player_dead(key)
     elif game_state == GameStates.TARGETING:
         return handle_keys_targeting(key)
-    elif game_state in (GameStates.SHOW_INVENTORY, GameStates.DROP_INVENTORY):
-        return handle_keys_inventory(key)
 
     return {}
 
@@ -59,8 +133,15 @@ def handle_keys_inventory(key):
     index = key.c - ord('a')
 
     if index >= 0:
+        # Letter on the menu page, the engine turns it into an item index
         return {'inventory_index': index}
 
+    # Long inventories are shown a page at a time
+    if key.vk == libtcod.KEY_PAGEUP:
+        return {'menu_page': -1}
+    elif key.vk == libtcod.KEY_PAGEDOWN:
+        return {'menu_page': 1}
+
     if key.vk == libtcod.KEY_ENTER and key.lalt:
         # Alt+Enter: toggle full screen
         return {'fullscreen': True}
@@ -85,8 +166,14 @@ def handle_keys_player_dead(key):
 
     return {}
 
-def handle_mouse(mouse):
-    (x, y) = (mouse.cx, mouse.cy)
+def handle_mouse(mouse, camera):
+    # Clicks are returned in map coordinates, clicks outside the map view are ignored
+    map_point = camera.to_map(mouse.cx, mouse.cy)
+
+    if map_point is None:
+        return {}
+
+    (x, y) = map_point
 
     if mouse.lbutton_pressed:
         return {'left_click': (x, y)}
@@ -1,5 +1,6 @@
 import tcod as libtcod
 
+from area_functions import area_tiles, entities_on_tiles, nearest
 from components.ai import ConfusedMonster
 
 from game_messages import Message
@@ -46,18 +47,11 @@ def cast_lightning(*args, **kwargs):
 
     results = []
 
-    target = None
-    closest_distance = maximum_range + 1
+    targets = nearest(entities, caster.x, caster.y, maximum_range + 1, visible=fov_map.fov,
+                      condition=lambda entity: entity.fighter and entity != caster)
 
-    for entity in entities:
-        if entity.fighter and entity != caster and libtcod.map_is_in_fov(fov_map, entity.x, entity.y):
-            distance = caster.distance_to(entity)
-
-            if distance < closest_distance:
-                target = entity
-                closest_distance = distance
-
-    if target:
+    if targets:
+        target = targets[0]
         results.append({
             'item_consumed': True,
             'target': target,
@@ -75,14 +69,18 @@ def cast_lightning(*args, **kwargs):
 
 def cast_fireball(*args, **kwargs):
     """
+    0 - caster\n
     kwargs:\n
     'entities' - all entities\n
     'fov_map' - we need only those who in FOV\n
     'damage' - cast damage\n
     'radius' - explosion radius\n
+    'area' - 'circle' around the target (default), 'cone' or 'line' from the caster to it
+    (see area_functions, 'angle' for the cone)\n
     'target_x' - target x coord
     'target_y' - target y coord
     """
+    caster = args[0]
     entities = kwargs.get('entities')
     fov_map = kwargs.get('fov_map')
     damage = kwargs.get('damage')
@@ -92,19 +90,25 @@ def cast_fireball(*args, **kwargs):
 
     results = []
 
-    if not libtcod.map_is_in_fov(fov_map, target_x, target_y):
+    if not fov_map.fov[target_x, target_y]:
         results.append({
             'item_consumed': False,
             'message': Message('You cannot target a tile outside view', libtcod.yellow)
         })
 
+        return results
+
     results.append({
         'item_consumed': True,
         'message': Message('The Fireball explodes, burning everything within {0} radius!'.format(radius), libtcod.orange)
     })
 
-    for entity in entities:
-        if entity.distance(target_x, target_y) <= radius and entity.fighter:
+    # Walls stop the blast, only the tiles it reaches are looked at
+    xs, ys = area_tiles(kwargs.get('area', 'circle'), fov_map.transparent, caster.x, caster.y, target_x, target_y,
+                        radius=radius, angle=kwargs.get('angle', 90))
+
+    for entity in entities_on_tiles(entities, xs, ys):
+        if entity.fighter:
             results.append({
                 'message': Message('The {0} gets burned for {1} hit points'.format(entity.name, damage), libtcod.orange)
             })
@@ -127,14 +131,16 @@ def cast_confusion(*args, **kwargs):
 
     results = []
 
-    if not libtcod.map_is_in_fov(fov_map, target_x, target_y):
+    if not fov_map.fov[target_x, target_y]:
         results.append({
             'item_consumed': False,
             'message': Message('You cannot target a tile outside your field of view.', libtcod.yellow)
         })
 
-    for entity in entities:
-        if entity.x == target_x and entity.y == target_y and entity.ai:
+        return results
+
+    for entity in entities.at(target_x, target_y):
+        if entity.ai:
             confused_ai_comp = ConfusedMonster(entity.ai, 10)
 
             confused_ai_comp.owner = entity
@@ -149,4 +155,4 @@ def cast_confusion(*args, **kwargs):
     else:
         results.append({'item_consumed': False, 'message': Message('There is no targetable enemy at that location.', libtcod.yellow)})
 
-    return results
\ No newline at end of file
+    return results
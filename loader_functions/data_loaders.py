@@ -0,0 +1,316 @@
+import json
+import os
+import shutil
+
+import numpy as np
+import tcod as libtcod
+
+import item_functions
+
+from components.ai import BasicMonster, ConfusedMonster
+from components.fighter import Fighter
+from components.inventory import Inventory
+from components.item import Item
+
+from entity import Entity
+from entity_index import EntityIndex
+from game_messages import LoggedMessage, Message, MessageLog
+from game_states import GameStates
+from map_objects.game_map import GameMap
+from render_functions import RenderOrder
+
+# A save is a directory: one raw .npy file per tile layer (memory-mapped when loading),
+# one record per entity in entities.npy and everything that is text in game.json.
+# Every save writes a new generation of the .npy files (walkable.4.npy...) and game.json names the one it goes with
+SAVE_VERSION = 5
+TILE_LAYERS = ('walkable', 'transparent', 'explored')
+
+# AI components are stored as a small number
+AI_NONE = 0
+AI_BASIC = 1
+AI_CONFUSED = 2
+
+# Entities on the map have no owner, inventory items have the index of the entity carrying them
+NO_OWNER = -1
+
+ENTITY_DTYPE = np.dtype([
+    ('x', np.int32), ('y', np.int32),
+    ('char', np.int32), ('color', np.uint8, 3), ('name', np.int32),
+    ('blocks', np.bool_), ('render_order', np.int8),
+    ('fighter', np.bool_), ('hp', np.int32), ('max_hp', np.int32), ('defense', np.int32), ('power', np.int32),
+    ('ai', np.int8), ('previous_ai', np.int8), ('confused_turns', np.int32),
+    ('item', np.int32), # index in the item table, -1 - not an item
+    ('inventory_capacity', np.int32), # -1 - no inventory
+    ('speed', np.int16),
+    ('owner', np.int32),
+    ('cell_order', np.int32) # place among the entities on the same tile, they are found in that order
+])
+
+def save_exists(save_path):
+    return os.path.isfile(os.path.join(save_path, 'game.json'))
+
+def delete_save(save_path):
+    if os.path.isdir(save_path):
+        shutil.rmtree(save_path)
+
+def save_game(save_path, player, entities, game_map, message_log, game_state, turn = 0):
+    """
+    Writes the game into save_path directory. The arrays go to new files next to the old save, which stays whole
+    until game.json is renamed over its own: a save interrupted halfway leaves the previous game behind
+    """
+    os.makedirs(save_path, exist_ok=True)
+
+    generation = 0
+    if save_exists(save_path):
+        generation = read_game_json(save_path).get('generation', 0) + 1
+
+    strings = StringTable()
+    items = []
+    item_indexes = {}
+
+    # Map entities first, then whatever they carry, so inventory order is kept by record order
+    ordered = list(entities)
+    for entity in entities:
+        if entity.inventory:
+            ordered.extend(entity.inventory.items)
+    index_of = {id(entity): i for i, entity in enumerate(ordered)}
+
+    owners = {}
+    for entity in entities:
+        if entity.inventory:
+            for item in entity.inventory.items:
+                owners[id(item)] = index_of[id(entity)]
+
+    # Entities sharing a tile keep the order they came there in: pickup takes the first item of the tile
+    cell_orders = {}
+    for cell in entities.cells.values():
+        for order, entity in enumerate(cell):
+            cell_orders[id(entity)] = order
+
+    # Rows are built as plain tuples and turned into the record array in one go
+    rows = []
+    for entity in ordered:
+        fighter = entity.fighter
+        if fighter:
+            fighter_fields = (True, fighter.hp, fighter.max_hp, fighter.defense, fighter.power)
+        else:
+            fighter_fields = (False, 0, 0, 0, 0)
+
+        item = -1
+        if entity.item:
+            # Items of one kind share one table row
+            description = describe_item(entity.item)
+            key = json.dumps(description, sort_keys=True)
+            if key not in item_indexes:
+                item_indexes[key] = len(items)
+                items.append(description)
+            item = item_indexes[key]
+
+        rows.append((entity.x, entity.y, ord(entity.char), color_to_list(entity.color), strings.index(entity.name),
+                     entity.blocks, entity.render_order.value) + fighter_fields + encode_ai(entity.ai) +
+                    (item, entity.inventory.capacity if entity.inventory else -1, entity.speed,
+                     owners.get(id(entity), NO_OWNER), cell_orders.get(id(entity), 0)))
+
+    records = np.array(rows, dtype=ENTITY_DTYPE)
+
+    game = {
+        'version': SAVE_VERSION,
+        'generation': generation,
+        'map': {'width': game_map.width, 'height': game_map.height, 'depth': game_map.depth, 'seed': game_map.seed},
+        'turn': turn,
+        'player': index_of[id(player)],
+        'game_state': game_state.name,
+        'strings': strings.strings,
+        'items': items,
+        'messages': {
+            'x': message_log.x, 'width': message_log.width, 'height': message_log.height,
+            'capacity': message_log.messages.maxlen,
+            'entries': [[message.text, color_to_list(message.color), message.count] for message in message_log.messages]
+        }
+    }
+
+    for layer in TILE_LAYERS:
+        write_array(save_path, array_file(layer, generation), np.asfortranarray(getattr(game_map, layer)))
+    write_array(save_path, array_file('entities', generation), records)
+
+    # game.json goes last, one rename switches the whole save to the new files
+    write_file(save_path, 'game.json', lambda f: f.write(json.dumps(game).encode('utf-8')))
+
+    remove_old_arrays(save_path, generation)
+
+def load_game(save_path):
+    """
+    Reads a game written by save_game. Returns the same values as get_game_variables
+    """
+    game = read_game_json(save_path)
+
+    if game['version'] != SAVE_VERSION:
+        raise ValueError('Unsupported save version: {0}'.format(game['version']))
+
+    map_data = game['map']
+    game_map = GameMap(map_data['width'], map_data['height'], map_data['depth'])
+    game_map.seed = map_data['seed']
+
+    # Mapped, not read: the layers go straight from the page cache into the map's own buffers
+    for layer in TILE_LAYERS:
+        getattr(game_map, layer)[...] = np.load(os.path.join(save_path, array_file(layer, game['generation'])),
+                                                mmap_mode='r')
+
+    records = np.load(os.path.join(save_path, array_file('entities', game['generation'])))
+    strings = game['strings']
+    items = [build_item(description) for description in game['items']]
+
+    loaded = []
+    for record in records.tolist():
+        (x, y, char, color, name, blocks, render_order, has_fighter, hp, max_hp, defense, power,
+         ai, previous_ai, confused_turns, item, inventory_capacity, speed, owner, cell_order) = record
+
+        fighter = None
+        if has_fighter:
+            fighter = Fighter(max_hp, defense, power)
+            fighter.hp = hp
+
+        item_component = None
+        if item >= 0:
+            item_component = items[item]()
+
+        inventory = None
+        if inventory_capacity >= 0:
+            inventory = Inventory(inventory_capacity)
+
+        loaded.append(Entity(x, y, chr(char), libtcod.Color(*color), strings[name], blocks,
+                             RenderOrder(render_order), fighter, decode_ai(ai, previous_ai, confused_turns),
+                             item_component, inventory, speed))
+
+    entities = EntityIndex()
+    for entity, owner in zip(loaded, records['owner'].tolist()):
+        if owner == NO_OWNER:
+            entities.append(entity)
+        else:
+            loaded[owner].inventory.items.append(entity)
+
+    cell_orders = records['cell_order'].tolist()
+    slots = {id(entity): i for i, entity in enumerate(loaded)}
+    entities.order_cells(lambda entity: cell_orders[slots[id(entity)]])
+
+    messages = game['messages']
+    message_log = MessageLog(messages['x'], messages['width'], messages['height'], messages['capacity'])
+    message_log.messages.extend(LoggedMessage(text, libtcod.Color(*color), count)
+                                for text, color, count in messages['entries'])
+
+    return loaded[game['player']], entities, game_map, message_log, GameStates[game['game_state']]
+
+def saved_turn(save_path):
+    # Turn number the save was made on
+    return read_game_json(save_path).get('turn', 0)
+
+def saved_files(save_path):
+    # Names of the files the save in save_path is made of
+    generation = read_game_json(save_path)['generation']
+
+    return ('game.json',) + tuple(array_file(name, generation) for name in TILE_LAYERS + ('entities',))
+
+def read_game_json(save_path):
+    with open(os.path.join(save_path, 'game.json'), 'rb') as f:
+        return json.loads(f.read().decode('utf-8'))
+
+def encode_ai(ai):
+    # (ai, previous_ai, confused_turns)
+    if ai is None:
+        return AI_NONE, AI_NONE, 0
+    if isinstance(ai, ConfusedMonster):
+        # Confusing a confused monster wraps one ConfusedMonster in another. It is saved as one confusion
+        # lasting as long as all of them together
+        turns = ai.number_of_turns
+        previous_ai = ai.previous_ai
+        while isinstance(previous_ai, ConfusedMonster):
+            turns += previous_ai.number_of_turns
+            previous_ai = previous_ai.previous_ai
+        return AI_CONFUSED, encode_ai(previous_ai)[0], turns
+
+    return AI_BASIC, AI_NONE, 0
+
+def decode_ai(ai, previous_ai, confused_turns):
+    if ai == AI_BASIC:
+        return BasicMonster()
+    if ai == AI_CONFUSED:
+        return ConfusedMonster(decode_ai(previous_ai, AI_NONE, 0), confused_turns)
+
+    return None
+
+def describe_item(item):
+    # use_function is saved by name and looked up in item_functions again when loading
+    targeting_message = None
+    if item.targeting_message:
+        targeting_message = [item.targeting_message.text, color_to_list(item.targeting_message.color)]
+
+    return {
+        'use_function': item.use_function.__name__ if item.use_function else None,
+        'targeting': item.targeting,
+        'targeting_message': targeting_message,
+        'kwargs': item.function_kwargs
+    }
+
+def build_item(description):
+    # Returns a function making Item components from a description, items of one kind share the message
+    use_function = None
+    if description['use_function']:
+        use_function = getattr(item_functions, description['use_function'])
+
+    targeting_message = None
+    if description['targeting_message']:
+        text, color = description['targeting_message']
+        targeting_message = Message(text, libtcod.Color(*color))
+
+    def make_item():
+        return Item(use_function, description['targeting'], targeting_message, **description['kwargs'])
+
+    return make_item
+
+def color_to_list(color):
+    return [color[0], color[1], color[2]]
+
+def array_file(name, generation):
+    return '{0}.{1}.npy'.format(name, generation)
+
+def write_array(save_path, file_name, array):
+    write_file(save_path, file_name, lambda f: np.save(f, array))
+
+def remove_old_arrays(save_path, generation):
+    # Arrays of the saves before this one (or of a save interrupted halfway)
+    names = TILE_LAYERS + ('entities',)
+    current = {array_file(name, generation) for name in names}
+
+    for file_name in os.listdir(save_path):
+        if file_name.endswith('.npy') and file_name.split('.')[0] in names and file_name not in current:
+            try:
+                os.remove(os.path.join(save_path, file_name))
+            except OSError:
+                # Still mapped by a loaded game on some systems, the next save tries again
+                pass
+
+def write_file(save_path, file_name, write):
+    path = os.path.join(save_path, file_name)
+    temp_path = path + '.tmp'
+
+    with open(temp_path, 'wb') as f:
+        write(f)
+
+    # A loaded game may still have the old file mapped, the rename leaves that mapping alone
+    os.replace(temp_path, path)
+
+class StringTable:
+    """
+    Every distinct string once, records keep its index
+    """
+    def __init__(self):
+        self.strings = []
+        self.indexes = {}
+
+    def index(self, string):
+        index = self.indexes.get(string)
+        if index is None:
+            index = self.indexes[string] = len(self.strings)
+            self.strings.append(string)
+
+        return index
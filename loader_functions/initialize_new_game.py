@@ -0,0 +1,135 @@
+import tcod as libtcod
+
+from random import getrandbits
+
+from components.fighter import Fighter
+from components.inventory import Inventory
+
+from entity import Entity
+from entity_index import EntityIndex
+from game_messages import MessageLog
+from game_states import GameStates
+from map_objects.level_generator import generate_level, build_level, level_settings
+from render_functions import RenderOrder
+from rng_streams import rng
+
+def get_constants():
+    # console props
+    screen_width = 80
+    screen_height = 50
+
+    # UI settings
+    bar_width = 20
+    ui_panel_height = 7
+    ui_panel_y = screen_height - ui_panel_height
+    ## Message system
+    message_x = bar_width + 2
+    message_width = screen_width - bar_width - 2
+    message_height = ui_panel_height - 1
+    message_capacity = 1000 # messages kept for scrolling back (PageUp / PageDown)
+
+    # player props
+    player_hp = 30
+
+    # map props
+    map_width = 80
+    map_height = 43
+    room_max_size = 10
+    room_min_size = 6
+    max_rooms = 30
+    max_monsters_per_room = 3
+    max_items_per_room = 4
+
+    # Level generation settings
+    seed = None # None - new random dungeon every game
+    levels_ahead = 2 # levels built in background processes ahead of the current one
+
+    # FOV settings
+    fov_algorithm = 0
+    fov_light_walls = True
+    fov_radius = 10
+
+    # Sleeping monsters farther than this from the player can't be in his sight, they aren't checked for waking up.
+    # Two more than the FOV radius: monsters act before the FOV follows the player's last step
+    monster_wake_radius = fov_radius + 2
+
+    # AI settings
+    ai_distance_map = True # all monsters chase the player using one Dijkstra map instead of A* each
+
+    # Profiling settings (F3 toggles it in game, F4 dumps the collected data)
+    profiler_enabled = False
+    profiler_dump_path = 'profile.json'
+
+    # Save settings: the game is saved there on exit and continued on the next start
+    save_path = 'savegame'
+    snapshot_interval = 100 # turns between full saves, the turn journal covers the ones in between
+    recordings_path = 'recordings' # every session is recorded there for replay.py, None - don't record
+
+    # Colors dictionary
+    colors = {
+        'dark_wall': libtcod.Color(0, 0, 100),
+        'dark_ground': libtcod.Color(50, 50, 150),
+        'light_wall': libtcod.Color(130, 110, 50),
+        'light_ground': libtcod.Color(200, 180, 50)
+    }
+
+    constants = {
+        'window_title': 'First Shem RL. Thanks Tutorial',
+        'screen_width': screen_width,
+        'screen_height': screen_height,
+        'bar_width': bar_width,
+        'ui_panel_height': ui_panel_height,
+        'ui_panel_y': ui_panel_y,
+        'message_x': message_x,
+        'message_width': message_width,
+        'message_height': message_height,
+        'message_capacity': message_capacity,
+        'player_hp': player_hp,
+        'map_width': map_width,
+        'map_height': map_height,
+        'room_max_size': room_max_size,
+        'room_min_size': room_min_size,
+        'max_rooms': max_rooms,
+        'max_monsters_per_room': max_monsters_per_room,
+        'max_items_per_room': max_items_per_room,
+        'seed': seed,
+        'levels_ahead': levels_ahead,
+        'fov_algorithm': fov_algorithm,
+        'fov_light_walls': fov_light_walls,
+        'fov_radius': fov_radius,
+        'monster_wake_radius': monster_wake_radius,
+        'ai_distance_map': ai_distance_map,
+        'profiler_enabled': profiler_enabled,
+        'profiler_dump_path': profiler_dump_path,
+        'save_path': save_path,
+        'snapshot_interval': snapshot_interval,
+        'recordings_path': recordings_path,
+        'colors': colors
+    }
+
+    return constants
+
+def get_game_variables(constants):
+    # Entities setup
+    player_fighter_comp = Fighter(constants['player_hp'], 2, 5)
+    player_inventory_comp = Inventory(12)
+    player = Entity(0, 0, '@', libtcod.white, 'Player', True, RenderOrder.ACTOR, 
+                    player_fighter_comp, inventory=player_inventory_comp)
+    entities = EntityIndex([player])
+
+    # Gamemap setup. Without a fixed seed the global random module decides, so random.seed still works
+    seed = constants['seed']
+    if seed is None:
+        seed = getrandbits(32)
+
+    # Everything random in the game follows from this one seed
+    rng.seed(seed)
+
+    game_map = build_level(generate_level(seed, 1, level_settings(constants)), player, entities)
+
+    message_log = MessageLog(constants['message_x'], constants['message_width'], constants['message_height'],
+                             constants['message_capacity'])
+
+    game_state = GameStates.PLAYERS_TURN
+
+    return player, entities, game_map, message_log, game_state
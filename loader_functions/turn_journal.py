@@ -0,0 +1,205 @@
+import json
+import os
+import queue
+import random
+import threading
+
+from fov_functions import initialize_fov, recompute_fov
+from game_states import GameStates
+from loader_functions.data_loaders import save_game
+from rng_streams import rng
+from turn_functions import play_player_turn, play_enemy_turn
+
+# The journal is a text file next to the save, one JSON object per line. The first line says which snapshot
+# it continues and how the random streams were seeded then, every other line is one input with its results:
+#   {"turn": 120, "seed": 2837452}
+#   {"a": {"move": [1, 0]}, "m": {}, "r": [["message", "Orc attacks Player for 1 hit points."]]}
+JOURNAL_FILE = 'journal.log'
+
+class LineWriter:
+    """
+    Writes lines to a file from a background thread and flushes them to disk,
+    so the game loop never waits for the disk
+    """
+    def __init__(self, path):
+        self.path = path
+
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self.write_lines, daemon=True)
+        self.thread.start()
+
+    def start(self, line):
+        # Empties the file and writes line as the first one
+        self.queue.put(('start', line))
+
+    def append(self, line):
+        self.queue.put(('append', line))
+
+    def close(self):
+        # Waits until everything queued is on disk
+        self.queue.put(('close', None))
+        self.thread.join()
+
+    def write_lines(self):
+        f = None
+
+        while True:
+            command, line = self.queue.get()
+
+            if command == 'close':
+                break
+            elif command == 'start':
+                if f:
+                    f.close()
+                os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+                f = open(self.path, 'w', encoding='utf-8')
+
+            if f:
+                f.write(line)
+
+                # Several lines may be waiting, they all go to disk together
+                if self.queue.empty():
+                    f.flush()
+                    os.fsync(f.fileno())
+
+        if f:
+            f.flush()
+            os.fsync(f.fileno())
+            f.close()
+
+class TurnJournal:
+    """
+    Append-only log of player inputs and what they caused since the last snapshot
+    """
+    def __init__(self, save_path):
+        self.writer = LineWriter(os.path.join(save_path, JOURNAL_FILE))
+        # Turn of the snapshot the journal continues
+        self.turn = None
+
+    def start(self, turn, seed):
+        # A new snapshot was taken: everything before it is not needed anymore
+        self.turn = turn
+        self.writer.start(to_line({'turn': turn, 'seed': seed}))
+
+    def record(self, action, mouse_action, results):
+        self.writer.append(to_line({'a': action, 'm': mouse_action, 'r': summarize_results(results)}))
+
+    def close(self):
+        self.writer.close()
+
+def take_snapshot(save_path, journal, player, entities, game_map, message_log, turn_state):
+    """
+    Saves the whole game and starts a new journal from it. Returns the seed the random streams got
+    """
+    # Menus and targeting are not saved, the game continues from the player's turn
+    save_game(save_path, player, entities, game_map, message_log, GameStates.PLAYERS_TURN, turn_state.turn)
+
+    # Random streams state is not saved, they are seeded again instead
+    seed = random.getrandbits(32)
+    restart_streams(game_map, turn_state, seed)
+
+    journal.start(turn_state.turn, seed)
+
+    return seed
+
+def restart_streams(game_map, turn_state, seed):
+    """
+    Puts the game into the state a loaded snapshot starts in: random streams seeded with seed,
+    no remembered monster paths and a new turn scheduler. Replaying inputs after it then takes the same steps
+    as the game did
+    """
+    rng.seed(seed)
+    game_map.pathfinder.invalidate()
+    turn_state.scheduler = None
+
+def replay_journal(save_path, constants, player, entities, game_map, message_log, turn_state):
+    """
+    Plays the inputs from the journal on top of the game just loaded from the snapshot, to get back
+    what happened after it (after a crash, for example). Stops at the first input which results differ
+    from the recorded ones. Returns the number of inputs replayed
+    """
+    entries = read_journal(os.path.join(save_path, JOURNAL_FILE))
+
+    # The journal may belong to an older snapshot if the game stopped right after saving
+    if not entries or entries[0].get('turn') != turn_state.turn:
+        return 0
+
+    restart_streams(game_map, turn_state, entries[0]['seed'])
+
+    fov_map = initialize_fov(game_map)
+    turn_state.results = []
+
+    replayed = 0
+    for entry in entries[1:]:
+        if replay_entry(entry, constants, player, entities, game_map, fov_map, message_log, turn_state) != entry['r']:
+            break
+
+        replayed += 1
+
+    turn_state.results = None
+    # The screen has to be drawn from scratch
+    turn_state.fov_recompute = True
+
+    return replayed
+
+def replay_entry(entry, constants, player, entities, game_map, fov_map, message_log, turn_state):
+    """
+    Plays one recorded input the way the main loop does. Returns the summary of its results
+    """
+    if turn_state.fov_recompute:
+        recompute_fov(fov_map, player.x, player.y, constants['fov_radius'], constants['fov_light_walls'],
+                      constants['fov_algorithm'])
+        turn_state.fov_recompute = False
+
+    play_player_turn(from_json(entry['a']), from_json(entry['m']), player, entities, game_map, fov_map,
+                     message_log, turn_state)
+    play_enemy_turn(player, entities, game_map, fov_map, message_log, turn_state, constants['ai_distance_map'],
+                    constants['monster_wake_radius'])
+
+    results = summarize_results(turn_state.results)
+    turn_state.results.clear()
+
+    return results
+
+def read_journal(path):
+    # The last line may be cut if the game crashed while writing it, everything from there on is dropped
+    entries = []
+
+    if not os.path.isfile(path):
+        return entries
+
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                break
+
+    return entries
+
+def summarize_results(results):
+    # Messages are kept as text and entities as names: enough to check a replay, and small
+    summary = []
+
+    for result in results:
+        for key, value in result.items():
+            summary.append([key, summarize_value(value)])
+
+    return summary
+
+def summarize_value(value):
+    if hasattr(value, 'text'):
+        return value.text
+    if hasattr(value, 'name'):
+        return value.name
+    if value is None or isinstance(value, (bool, int)):
+        return value
+
+    return str(value)
+
+def from_json(action):
+    # JSON has no tuples: moves and clicks come back as lists
+    return {key: tuple(value) if isinstance(value, list) else value for key, value in action.items()}
+
+def to_line(data):
+    return json.dumps(data, separators=(',', ':')) + '\n'
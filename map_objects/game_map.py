@@ -1,138 +1,196 @@
-import tcod as libtcod
-from random import randint
+import numpy as np
+from random import getrandbits
 
-from components.fighter import Fighter
-from components.ai import BasicMonster
-from components.item import Item
-
-from map_objects.tile import Tile
+from map_objects.tile import TileGrid
 from map_objects.rectangle import RL_Rect
+from map_objects.pathfinding import PathFinder
+from map_objects.spawn_tables import default_spawn_tables
+
+from fov_functions import FovMap
 
-from entity import Entity
-from render_functions import RenderOrder
-from item_functions import itm_heal, cast_lightning, cast_fireball, cast_confusion
-from game_messages import Message
+from entity_factory import create_entity
 
 class GameMap:
-    def __init__(self, width, height):
+    def __init__(self, width, height, depth = 1):
         self.width = width
         self.height = height
-        self.tiles = self.initialize_tiles()
+        self.depth = depth
+        # Seed the level was generated from, if it was
+        self.seed = None
+        self.initialize_tiles()
 
-    def initialize_tiles(self):
-        tiles = [[Tile(True) for y in range(self.height)] for x in range(self.width)]
+        # Tile-style view (tiles[x][y].blocked) for the code that still works cell by cell
+        self.tiles = TileGrid(self)
+
+        self.pathfinder = PathFinder(self)
 
-        return tiles
+    def initialize_tiles(self):
+        # Walkability and transparency live directly in the FOV map buffers, indexed [x, y],
+        # so FOV and pathfinding read the tiles without any copy. Everything starts as a wall
+        self.explored = np.zeros((self.width, self.height), dtype=np.bool_, order='F')
+        self.fov_map = FovMap(self.width, self.height, self.explored)
+        self.walkable = self.fov_map.walkable
+        self.transparent = self.fov_map.transparent
+
+    def set_tile(self, x, y, blocked, block_sight = None):
+        # by default it is also block sight
+        if block_sight is None:
+            block_sight = blocked
+
+        # Writing to the shared arrays is all it takes to update the FOV map
+        self.walkable[x, y] = not blocked
+        self.transparent[x, y] = not block_sight
+
+        # Remembered monster paths may go through this tile, and it may hide or show others
+        self.pathfinder.invalidate()
+        self.fov_map.tiles_changed()
 
     def make_map(self, max_rooms, room_min_size, room_max_size, player, 
-                entities, max_monsters_per_room, max_items_per_room):
-        rooms = []
-        num_rooms = 0
-        
+                entities, max_monsters_per_room, max_items_per_room, rng = None):
+        player_start, spawns = self.generate(max_rooms, room_min_size, room_max_size,
+                                             max_monsters_per_room, max_items_per_room, rng)
+
+        if player_start:
+            player.set_position(*player_start)
+
+        entities.extend(create_entity(name, x, y) for name, x, y in spawns)
+
+    def generate(self, max_rooms, room_min_size, room_max_size, max_monsters_per_room, max_items_per_room,
+                 rng = None, spawn_tables = None):
+        """
+        Carves the map and decides what spawns where, without creating any entity.
+        Returns player start (x, y) (None if no room fit) and a list of (name, x, y) spawns.
+        spawn_tables - what spawns how often (data/spawn_tables.json if not given)
+        """
+        # Seeded from the global random module unless a generator is given, so random.seed still works
+        if rng is None:
+            rng = np.random.default_rng(getrandbits(64))
+
+        # All candidate rooms at once
+        rand_w = rng.integers(room_min_size, room_max_size + 1, max_rooms)
+        rand_h = rng.integers(room_min_size, room_max_size + 1, max_rooms)
+        rand_x = rng.integers(0, self.width - rand_w)
+        rand_y = rng.integers(0, self.height - rand_h)
+        x1, y1, x2, y2 = rand_x, rand_y, rand_x + rand_w, rand_y + rand_h
+
+        # intersects[i, j] - room i intersects room j (same test as RL_Rect.is_intersect)
+        intersects = ((x1[:, np.newaxis] <= x2) & (x2[:, np.newaxis] >= x1) &
+                      (y1[:, np.newaxis] <= y2) & (y2[:, np.newaxis] >= y1))
+
+        # A room is kept if it doesn't intersect any room kept before it
+        kept = np.zeros(max_rooms, dtype=np.bool_)
         for r in range(max_rooms):
-            rand_w = randint(room_min_size, room_max_size)
-            rand_h = randint(room_min_size, room_max_size)
-            rand_x = randint(0, self.width - rand_w - 1)
-            rand_y = randint(0, self.height - rand_h - 1)
-
-            new_room = RL_Rect(rand_x, rand_y, rand_w, rand_h)
-
-            for other_room in rooms:
-                if new_room.is_intersect(other_room):
-                    break
-            else:
-                self.create_room(new_room)
-
-                #center of new room
-                (new_x, new_y) = new_room.center()
-
-                # place player in first room
-                if num_rooms == 0:
-                    player.x = new_x
-                    player.y = new_y
-                else:
-                    # all remained rooms. connect'em to previous
-                    (prev_x, prev_y) = rooms[num_rooms - 1].center()
-                    # flip a coin for tunnel directions order
-                    if randint(0, 1) == 1:
-                        self.create_h_tunnel(prev_x, new_x, prev_y)
-                        self.create_v_tunnel(prev_y, new_y, new_x)
-                    else:
-                        self.create_v_tunnel(prev_y, new_y, prev_x)
-                        self.create_h_tunnel(prev_x, new_x, new_y)
-                
-                self.place_entities(new_room, entities, max_monsters_per_room, max_items_per_room)
-
-                rooms.append(new_room)
-                num_rooms += 1
+            kept[r] = not (intersects[r, :r] & kept[:r]).any()
+
+        x1, y1, x2, y2 = x1[kept], y1[kept], x2[kept], y2[kept]
+        num_rooms = len(x1)
+
+        if num_rooms == 0:
+            return None, []
+
+        #centers of rooms
+        center_x = (x1 + x2) // 2
+        center_y = (y1 + y2) // 2
+
+        # place player in first room
+        player_start = (int(center_x[0]), int(center_y[0]))
+
+        # all remained rooms. connect'em to previous with L-shaped tunnels:
+        # flip a coin for tunnel directions order
+        prev_x, prev_y = center_x[:-1], center_y[:-1]
+        new_x, new_y = center_x[1:], center_y[1:]
+        h_first = rng.integers(0, 2, num_rooms - 1) == 1
+
+        h_y = np.where(h_first, prev_y, new_y)
+        v_x = np.where(h_first, new_x, prev_x)
+        left, right = np.minimum(prev_x, new_x), np.maximum(prev_x, new_x) + 1
+        top, bottom = np.minimum(prev_y, new_y), np.maximum(prev_y, new_y) + 1
+
+        # Rooms (inner part only), horizontal and vertical tunnels as [x1, x2) x [y1, y2) rectangles
+        self.carve_rects(np.concatenate([x1 + 1, left, v_x]),
+                         np.concatenate([y1 + 1, h_y, top]),
+                         np.concatenate([x2, right, v_x + 1]),
+                         np.concatenate([y2, h_y + 1, bottom]))
+
+        spawns = []
+        occupied = np.zeros((self.width, self.height), dtype=np.bool_)
+        occupied[player_start] = True
+        for r in range(num_rooms):
+            room = RL_Rect(int(x1[r]), int(y1[r]), int(x2[r] - x1[r]), int(y2[r] - y1[r]))
+            spawns.extend(self.roll_spawns(room, occupied, max_monsters_per_room, max_items_per_room, rng,
+                                           spawn_tables))
+
+        return player_start, spawns
+
+    def carve_rects(self, x1, y1, x2, y2):
+        # Make many [x1, x2) x [y1, y2) rectangles passable at once: +1/-1 at the corners of every
+        # rectangle, and the 2D cumulative sum is positive exactly inside at least one of them
+        corners = np.zeros((self.width + 1, self.height + 1), dtype=np.int32)
+        np.add.at(corners, (x1, y1), 1)
+        np.add.at(corners, (x2, y1), -1)
+        np.add.at(corners, (x1, y2), -1)
+        np.add.at(corners, (x2, y2), 1)
+
+        inside = corners.cumsum(axis=0).cumsum(axis=1)[:self.width, :self.height] > 0
+        self.walkable |= inside
+        self.transparent |= inside
 
     def create_room(self, room):
         # Make room space passable
-        for x in range(room.x1 + 1, room.x2):
-            for y in range(room.y1 + 1, room.y2):
-                self.tiles[x][y].blocked = False
-                self.tiles[x][y].block_sight = False
-
-    def place_entities(self, room, entities, max_monsters_per_room, max_items_per_room):
-        number_of_monsters = randint(0, max_monsters_per_room)
-        number_of_items = randint(0, max_items_per_room)
-
-        # Monsters
-        for i in range(number_of_monsters):
-            rand_x = randint(room.x1 + 1, room.x2 - 1)
-            rand_y = randint(room.y1 + 1, room.y2 - 1)
-
-            if not any([entity for entity in entities if entity.x == rand_x and entity.y == rand_y]):
-                if randint(0, 100) < 80:
-                    o_f_comp = Fighter(10, 0, 3)
-                    o_ai_comp = BasicMonster()
-                    monster = Entity(rand_x, rand_y, 'o', libtcod.desaturated_green, 'Orc', True, RenderOrder.ACTOR, o_f_comp, o_ai_comp)
-                else:
-                    t_f_comp = Fighter(16, 1, 4)
-                    t_ai_comp = BasicMonster()
-                    monster = Entity(rand_x, rand_y, 'T', libtcod.darker_green, 'Troll', True, RenderOrder.ACTOR, t_f_comp, t_ai_comp)
-
-                entities.append(monster)
-
-        # Items
-        for i in range(number_of_items):
-            rand_x = randint(room.x1 + 1, room.x2 - 1)
-            rand_y = randint(room.y1 + 1, room.y2 - 1)
-            if not any([entity for entity in entities if entity.x == rand_x and entity.y == rand_y]):
-                item_chance = randint(0, 100)
-
-                if item_chance < 60:
-                    item_heal_comp = Item(use_function=itm_heal, amount=4)
-                    item = Entity(rand_x, rand_y, '!', libtcod.violet, 'Healing Potion', render_order = RenderOrder.ITEM, item=item_heal_comp)
-                elif item_chance < 75:
-                    item_component = Item(use_function=cast_fireball, targeting=True, targeting_message=Message(
-                        'Left-click a target tile for the fireball, or right-click to cancel.', libtcod.light_cyan),
-                                          damage=12, radius=3)
-                    item = Entity(rand_x, rand_y, '#', libtcod.red, 'Fireball Scroll', render_order=RenderOrder.ITEM,
-                                  item=item_component)
-                elif item_chance < 90:
-                    item_component = Item(use_function=cast_confusion, targeting=True, targeting_message=Message(
-                        'Left-click an enemy to confuse it, or right-click to cancel.', libtcod.light_cyan))
-                    item = Entity(rand_x, rand_y, '#', libtcod.light_pink, 'Confusion Scroll', render_order=RenderOrder.ITEM,
-                                  item=item_component)
-                else:
-                    item_scroll_lightning_comp = Item(use_function=cast_lightning, damage=20, maximum_range=5)
-                    item = Entity(rand_x, rand_y, '#', libtcod.yellow, 'Lightning Scroll', render_order = RenderOrder.ITEM, item=item_scroll_lightning_comp)
-
-                entities.append(item)
+        self.carve(slice(room.x1 + 1, room.x2), slice(room.y1 + 1, room.y2))
+
+    def carve(self, xs, ys):
+        # Make a whole block of tiles passable at once
+        self.walkable[xs, ys] = True
+        self.transparent[xs, ys] = True
+
+    def place_entities(self, room, entities, max_monsters_per_room, max_items_per_room, rng = None):
+        if rng is None:
+            rng = np.random.default_rng(getrandbits(64))
+
+        occupied = np.zeros((self.width, self.height), dtype=np.bool_)
+        occupied[entities.store.column('x'), entities.store.column('y')] = True
+
+        spawns = self.roll_spawns(room, occupied, max_monsters_per_room, max_items_per_room, rng)
+        entities.extend(create_entity(name, x, y) for name, x, y in spawns)
+
+    def roll_spawns(self, room, occupied, max_monsters_per_room, max_items_per_room, rng, spawn_tables = None):
+        """
+        (name, x, y) of monsters and items for one room. occupied - [x, y] mask of the tiles that already
+        have something on them, the chosen tiles are marked in it
+        """
+        spawn_tables = spawn_tables or default_spawn_tables()
+
+        number_of_monsters = int(rng.integers(0, max_monsters_per_room + 1))
+        number_of_items = int(rng.integers(0, max_items_per_room + 1))
+
+        # Pick distinct free tiles of the room inner part right away instead of retrying taken ones
+        room_x, room_y = np.nonzero(~occupied[room.x1 + 1:room.x2, room.y1 + 1:room.y2])
+        room_x += room.x1 + 1
+        room_y += room.y1 + 1
+
+        number_of_monsters = min(number_of_monsters, len(room_x))
+        number_of_items = min(number_of_items, len(room_x) - number_of_monsters)
+        spots = rng.choice(len(room_x), number_of_monsters + number_of_items, replace=False)
+        occupied[room_x[spots], room_y[spots]] = True
+        spot_x = room_x[spots].tolist()
+        spot_y = room_y[spots].tolist()
+
+        # Monsters first, then items, each kind picked by the tables for this depth
+        names = (spawn_tables.monsters.sample(self.depth, rng, number_of_monsters) +
+                 spawn_tables.items.sample(self.depth, rng, number_of_items))
+        spawns = list(zip(names, spot_x, spot_y))
+
+        return spawns
 
     def create_h_tunnel(self, x1, x2, y):
-        for x in range(min(x1, x2), max(x1, x2) + 1):
-            self.tiles[x][y].blocked = False
-            self.tiles[x][y].block_sight = False
+        self.carve(slice(min(x1, x2), max(x1, x2) + 1), y)
 
     def create_v_tunnel(self, y1, y2, x):
-        for y in range(min(y1, y2), max(y1, y2) + 1):
-            self.tiles[x][y].blocked = False
-            self.tiles[x][y].block_sight = False
+        self.carve(x, slice(min(y1, y2), max(y1, y2) + 1))
 
     def is_blocked(self, x, y):
-        if self.tiles[x][y].blocked:
+        if not self.walkable[x, y]:
             return True
 
         return False
\ No newline at end of file
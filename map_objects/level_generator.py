@@ -0,0 +1,93 @@
+import numpy as np
+
+from concurrent.futures import ProcessPoolExecutor
+
+from map_objects.game_map import GameMap
+from entity_factory import create_entity
+
+class LevelSnapshot:
+    """
+    A generated level in a picklable form: tile arrays and (name, x, y) of everything to spawn
+    """
+    def __init__(self, depth, seed, walkable, transparent, player_start, spawns):
+        self.depth = depth
+        self.seed = seed
+        self.walkable = walkable
+        self.transparent = transparent
+        self.player_start = player_start
+        self.spawns = spawns
+
+def level_settings(constants):
+    # Only what generation needs, so it is cheap to send to another process
+    keys = ('map_width', 'map_height', 'max_rooms', 'room_min_size', 'room_max_size',
+            'max_monsters_per_room', 'max_items_per_room')
+    return {key: constants[key] for key in keys}
+
+def level_rng(seed, depth):
+    # Every level has its own stream, so a level doesn't depend on which levels were built before it
+    return np.random.default_rng([seed, depth])
+
+def generate_level(seed, depth, settings):
+    game_map = GameMap(settings['map_width'], settings['map_height'], depth)
+    player_start, spawns = game_map.generate(settings['max_rooms'], settings['room_min_size'],
+                                             settings['room_max_size'], settings['max_monsters_per_room'],
+                                             settings['max_items_per_room'], level_rng(seed, depth))
+
+    # Copies, the map's own arrays belong to its FOV map
+    return LevelSnapshot(depth, seed, np.array(game_map.walkable), np.array(game_map.transparent),
+                         player_start, spawns)
+
+def build_level(snapshot, player, entities):
+    """
+    Turns a snapshot into a GameMap, adds its monsters and items to entities and puts the player on the start tile
+    """
+    game_map = GameMap(snapshot.walkable.shape[0], snapshot.walkable.shape[1], snapshot.depth)
+    game_map.seed = snapshot.seed
+    game_map.walkable[...] = snapshot.walkable
+    game_map.transparent[...] = snapshot.transparent
+
+    if snapshot.player_start:
+        player.set_position(*snapshot.player_start)
+
+    entities.extend(create_entity(name, x, y) for name, x, y in snapshot.spawns)
+
+    return game_map
+
+class LevelPregenerator:
+    """
+    Builds the next levels_ahead levels in worker processes while the current one is played.
+    The worker processes are only started the first time a level is asked for
+    """
+    def __init__(self, seed, settings, levels_ahead = 2, max_workers = None):
+        self.seed = seed
+        self.settings = settings
+        self.levels_ahead = levels_ahead
+        self.max_workers = max_workers
+        self.executor = None
+        # depth -> Future of LevelSnapshot
+        self.futures = {}
+
+    def prefetch(self, depth):
+        # Make sure levels depth .. depth + levels_ahead - 1 are being built
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(self.max_workers)
+
+        for d in range(depth, depth + self.levels_ahead):
+            if d not in self.futures:
+                self.futures[d] = self.executor.submit(generate_level, self.seed, d, self.settings)
+
+    def get_level(self, depth):
+        """
+        Snapshot of the level at depth. Instant if it was prefetched and is ready, otherwise waits for it
+        """
+        self.prefetch(depth)
+        snapshot = self.futures.pop(depth).result()
+
+        # Start on the ones after it right away
+        self.prefetch(depth + 1)
+
+        return snapshot
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
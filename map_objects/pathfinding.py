@@ -0,0 +1,185 @@
+import numpy as np
+import tcod as libtcod
+
+from profiler import profiler
+
+# The 3x3 neighbourhood (with the centre), x major like a [x, y] window raveled
+NEIGHBOUR_DX = np.repeat(np.arange(-1, 2), 3)
+NEIGHBOUR_DY = np.tile(np.arange(-1, 2), 3)
+
+class PathFinder:
+    """
+    Pathfinding service of a GameMap. Keeps one cost grid (walls + blocking entities)
+    and one A* object for every monster, and remembers a path per monster
+    """
+    def __init__(self, game_map, diagonal_cost = 1.41):
+        self.game_map = game_map
+
+        # 0 - can't pass, 1 - free tile. Indexed [x, y] like the map arrays
+        self.cost = np.zeros((game_map.width, game_map.height), dtype=np.int8, order='F')
+
+        # A* reads the cost array in place, so it has to be created only once
+        self.astar = libtcod.path.AStar(self.cost, diagonal_cost)
+
+        # entity -> ((target_x, target_y), [(x, y), ...] steps left)
+        self.paths = {}
+
+        # Dijkstra map of steps to the player, shared by every chasing monster
+        self.distance_map = None
+        self.distance_origin = None
+
+    def update_occupancy(self, entities):
+        # Refresh walls from the map and put every blocking entity on top of them
+        self.cost[...] = self.game_map.walkable
+
+        # All at once from the entity store columns
+        store = entities.store
+        blocks = store.column('blocks').astype(np.bool_)
+        self.cost[store.column('x')[blocks], store.column('y')[blocks]] = 0
+
+        # Dead monsters don't chase anybody anymore
+        for entity in [entity for entity in self.paths if not entity.ai]:
+            del self.paths[entity]
+
+    def move_entity(self, old_x, old_y, new_x, new_y):
+        # Keep the occupancy overlay in sync when a blocking entity moves during the turn
+        self.cost[old_x, old_y] = self.game_map.walkable[old_x, old_y]
+        self.cost[new_x, new_y] = 0
+
+    def forget(self, entity):
+        # The entity moved some other way than along its path
+        self.paths.pop(entity, None)
+
+    def invalidate(self):
+        # The map itself was changed, so no remembered path can be trusted
+        self.paths.clear()
+        self.distance_origin = None
+
+    def compute_distance_map(self, x, y):
+        # One flood fill from (x, y) over the walls. Entities are left out on purpose,
+        # they move every turn and are checked when a monster picks its step
+        if self.distance_origin == (x, y):
+            return
+
+        if self.distance_map is None:
+            self.distance_map = libtcod.path.maxarray((self.game_map.width, self.game_map.height),
+                                                      dtype=np.int32, order='F')
+        else:
+            self.distance_map[...] = np.iinfo(np.int32).max
+
+        self.distance_map[x, y] = 0
+        # Diagonal step costs the same as a cardinal one, so the distance is a number of moves
+        libtcod.path.dijkstra2d(self.distance_map, self.game_map.walkable, 1, 1)
+        profiler.count('dijkstra_fills')
+
+        self.distance_origin = (x, y)
+
+    def downhill_step(self, entity, max_distance = 25):
+        """
+        Returns the free neighbour tile closest to the distance map origin,
+        or None if there is no way down or the origin is max_distance moves away or more
+        """
+        distance = self.distance_map[entity.x, entity.y]
+
+        if distance >= max_distance:
+            return None
+
+        x1 = max(entity.x - 1, 0)
+        y1 = max(entity.y - 1, 0)
+        window = self.distance_map[x1:entity.x + 2, y1:entity.y + 2]
+        occupied = self.cost[x1:entity.x + 2, y1:entity.y + 2] == 0
+
+        # Tiles with somebody (or a wall) on them can't be stepped on
+        window = np.where(occupied, np.iinfo(np.int32).max, window)
+        i, j = np.unravel_index(np.argmin(window), window.shape)
+
+        if window[i, j] >= distance:
+            return None
+
+        return (x1 + int(i), y1 + int(j))
+
+    def downhill_steps(self, xs, ys, max_distance = 25):
+        """
+        downhill_step for many entities at once, given their coordinates as arrays.
+        Returns arrays (new_xs, new_ys, found): where found is False there is no way down
+        """
+        distance = self.distance_map[xs, ys]
+
+        # Neighbours in the same order downhill_step scans its window, so ties are broken the same way
+        nx = xs[:, np.newaxis] + NEIGHBOUR_DX
+        ny = ys[:, np.newaxis] + NEIGHBOUR_DY
+        inside = (nx >= 0) & (nx < self.game_map.width) & (ny >= 0) & (ny < self.game_map.height)
+        nx = np.clip(nx, 0, self.game_map.width - 1)
+        ny = np.clip(ny, 0, self.game_map.height - 1)
+
+        window = np.where(inside & (self.cost[nx, ny] != 0), self.distance_map[nx, ny], np.iinfo(np.int32).max)
+        best = np.argmin(window, axis=1)
+        rows = np.arange(len(xs))
+
+        found = (distance < max_distance) & (window[rows, best] < distance)
+
+        return nx[rows, best], ny[rows, best], found
+
+    def next_step(self, entity, target, max_length = 25):
+        """
+        Returns the next (x, y) on the way from entity to target,
+        or None if there is no path shorter than max_length
+        """
+        steps = self.cached_steps(entity, target)
+
+        if steps is None:
+            steps = self.compute_path(entity, target)
+            self.paths[entity] = ((target.x, target.y), steps)
+
+        # Check if the path exists, and in this case, also the path is shorter than max_length tiles
+        if not steps or len(steps) >= max_length:
+            return None
+
+        return steps.pop(0)
+
+    def cached_steps(self, entity, target):
+        cached = self.paths.get(entity)
+
+        if cached is None:
+            return None
+
+        (goal_x, goal_y), steps = cached
+
+        if not steps:
+            return None
+
+        # The path starts next to where the entity stood when it was found. If it was moved some other way
+        # since (pushed, confused...), following it would make it jump
+        next_x, next_y = steps[0]
+        if max(abs(next_x - entity.x), abs(next_y - entity.y)) != 1:
+            return None
+
+        # The target moved off the route, a new path is needed
+        if (target.x, target.y) != (goal_x, goal_y):
+            if (target.x, target.y) not in steps:
+                return None
+
+            # The target stepped onto the route itself, so the path only gets shorter
+            del steps[steps.index((target.x, target.y)) + 1:]
+            self.paths[entity] = ((target.x, target.y), steps)
+
+        # Something is standing on the next tile (the target tile is always occupied by the target)
+        if not self.cost[next_x, next_y] and (next_x, next_y) != (target.x, target.y):
+            return None
+
+        return steps
+
+    def compute_path(self, entity, target):
+        # Start and end points must be free for A*, the entity and the target are standing on them
+        start_cost = self.cost[entity.x, entity.y]
+        goal_cost = self.cost[target.x, target.y]
+        self.cost[entity.x, entity.y] = self.game_map.walkable[entity.x, entity.y]
+        self.cost[target.x, target.y] = self.game_map.walkable[target.x, target.y]
+
+        steps = self.astar.get_path(entity.x, entity.y, target.x, target.y)
+        profiler.count('astar_calls')
+
+        self.cost[entity.x, entity.y] = start_cost
+        self.cost[target.x, target.y] = goal_cost
+
+        return steps
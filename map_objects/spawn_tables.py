@@ -0,0 +1,96 @@
+import json
+import os
+
+import numpy as np
+
+SPAWN_TABLES_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data',
+                                 'spawn_tables.json')
+
+class AliasSampler:
+    """
+    Weighted choice by Walker's alias method: after an O(n) setup every draw is one random index
+    and one coin flip, however many names there are
+    """
+    def __init__(self, names, weights):
+        self.names = np.array(names)
+        count = len(weights)
+
+        scaled = np.asarray(weights, dtype=np.float64) * count / sum(weights)
+        self.probability = np.ones(count)
+        self.alias = np.arange(count)
+
+        # Every column gets filled up to 1 with a piece of a column that has more than 1
+        small = [i for i in range(count) if scaled[i] < 1.0]
+        large = [i for i in range(count) if scaled[i] >= 1.0]
+        while small and large:
+            less = small.pop()
+            more = large.pop()
+
+            self.probability[less] = scaled[less]
+            self.alias[less] = more
+
+            scaled[more] -= 1.0 - scaled[less]
+            (small if scaled[more] < 1.0 else large).append(more)
+
+    def sample(self, rng, count):
+        # count names at once, as a python list
+        columns = rng.integers(0, len(self.names), count)
+        keep = rng.random(count) < self.probability[columns]
+
+        return self.names[np.where(keep, columns, self.alias[columns])].tolist()
+
+class SpawnTable:
+    """
+    What can spawn and how often, changing with depth. weights - name -> [[depth, weight], ...],
+    every weight counts from its depth down until the next one
+    """
+    def __init__(self, weights):
+        self.weights = weights
+        # depth -> AliasSampler, made the first time a level of that depth is generated
+        self.samplers = {}
+
+    def weights_at(self, depth):
+        names = []
+        weights = []
+        for name, steps in self.weights.items():
+            weight = 0
+            for from_depth, step_weight in steps:
+                if from_depth <= depth:
+                    weight = step_weight
+
+            if weight > 0:
+                names.append(name)
+                weights.append(weight)
+
+        return names, weights
+
+    def sample(self, depth, rng, count):
+        if count == 0:
+            return []
+
+        sampler = self.samplers.get(depth)
+        if sampler is None:
+            sampler = self.samplers[depth] = AliasSampler(*self.weights_at(depth))
+
+        return sampler.sample(rng, count)
+
+class SpawnTables:
+    def __init__(self, monsters, items):
+        self.monsters = SpawnTable(monsters)
+        self.items = SpawnTable(items)
+
+def load_spawn_tables(path = SPAWN_TABLES_PATH):
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+
+    return SpawnTables(data['monsters'], data['items'])
+
+# Read once per process, the first time a level is generated
+default_tables = None
+
+def default_spawn_tables():
+    global default_tables
+    if default_tables is None:
+        default_tables = load_spawn_tables()
+
+    return default_tables
@@ -1,14 +1,57 @@
 class Tile:
     """
-    A tile on a map. May block movement, may block sight
+    A tile on a map. May block movement, may block sight.
+    It is only a view on one cell of the GameMap tile arrays, the data itself lives in the map
     """
-    def __init__(self, blocked, block_sight = None):
-        self.blocked = blocked
+    def __init__(self, game_map, x, y):
+        self.game_map = game_map
+        self.x = x
+        self.y = y
 
-        # by default it is also block sight
-        if block_sight == None:
-            block_sight = blocked
+    @property
+    def blocked(self):
+        return not self.game_map.walkable[self.x, self.y]
 
-        self.block_sight = block_sight
+    @blocked.setter
+    def blocked(self, value):
+        self.game_map.walkable[self.x, self.y] = not value
 
-        self.explored = False
\ No newline at end of file
+    @property
+    def block_sight(self):
+        return not self.game_map.transparent[self.x, self.y]
+
+    @block_sight.setter
+    def block_sight(self, value):
+        self.game_map.transparent[self.x, self.y] = not value
+
+    @property
+    def explored(self):
+        return bool(self.game_map.explored[self.x, self.y])
+
+    @explored.setter
+    def explored(self, value):
+        self.game_map.explored[self.x, self.y] = value
+
+class TileGrid:
+    """
+    Keeps the old tiles[x][y] access working on top of the map arrays
+    """
+    def __init__(self, game_map):
+        self.game_map = game_map
+
+    def __getitem__(self, x):
+        return TileColumn(self.game_map, x)
+
+    def __len__(self):
+        return self.game_map.width
+
+class TileColumn:
+    def __init__(self, game_map, x):
+        self.game_map = game_map
+        self.x = x
+
+    def __getitem__(self, y):
+        return Tile(self.game_map, self.x, y)
+
+    def __len__(self):
+        return self.game_map.height
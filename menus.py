@@ -1,15 +1,35 @@
 import tcod as libtcod
 
-def menu(con, header, options, width, screen_width, screen_height):
-    if len(options) > 12: raise ValueError('Cannot have a menu with more than 12 options')
+from functools import lru_cache
 
-    # calc total menu height for the header 
-    header_height = libtcod.console_get_height_rect(con, 0, 0, width, screen_height, header)
-    height = len(options) + header_height
+# Options shown at once, lettered (a) to (l). Longer menus are split into pages
+MENU_PAGE_SIZE = 12
 
-    # create off-screen console that represents the menu's window
-    window = libtcod.console.Console(width, height)
+def menu_pages(option_count):
+    return max((option_count + MENU_PAGE_SIZE - 1) // MENU_PAGE_SIZE, 1)
 
+def menu_page(header, options, page):
+    # Header and options of one page. Every page letters its options from (a) again
+    pages = menu_pages(len(options))
+
+    if pages > 1:
+        header = '{0}Page {1}/{2}, PageUp / PageDown to turn it.\n'.format(header, page + 1, pages)
+
+    return header, options[page * MENU_PAGE_SIZE:(page + 1) * MENU_PAGE_SIZE]
+
+def menu_size(header, options, width):
+    # Header height and total menu height
+    if len(options) > MENU_PAGE_SIZE:
+        raise ValueError('Cannot have a menu page with more than {0} options'.format(MENU_PAGE_SIZE))
+
+    return header_height(header, width), len(options) + header_height(header, width)
+
+@lru_cache(maxsize=32)
+def header_height(header, width):
+    # calc total menu height for the header (no console needed to measure it). Headers hardly ever change
+    return libtcod.console.get_height_rect(width, header)
+
+def draw_menu(window, header, options, width, height, header_height):
     # print header (with auto-wrap)
     libtcod.console_set_default_foreground(window, libtcod.white)
     #libtcod.console_set_default_background(window, libtcod.gray)
@@ -24,15 +44,14 @@ def menu(con, header, options, width, screen_width, screen_height):
         y += 1
         letter_index += 1
 
+def blit_menu(window, root, width, height, screen_width, screen_height):
     # blit the contents of "window" to the root console
     x = int(screen_width / 2 - width / 2)
     y = int(screen_height / 2 - height / 2)
-    libtcod.console_blit(window, 0, 0, width, height, 0, x, y, 1.0, 0.7)
+    libtcod.console_blit(window, 0, 0, width, height, root, x, y, 1.0, 0.7)
 
-def inventory_menu(con, header, inventory, inventory_width, screen_width, screen_height):
+def inventory_options(inventory):
     if len(inventory.items) == 0:
-        options = ['Inventory is empty.']
-    else:
-        options = [item.name for item in inventory.items]
+        return ['Inventory is empty.']
 
-    menu(con, header, options, inventory_width, screen_width, screen_height)
\ No newline at end of file
+    return [item.name for item in inventory.items]
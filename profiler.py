@@ -0,0 +1,171 @@
+import json
+import time
+
+from collections import deque
+
+class PhaseTimer:
+    """
+    Context manager adding the time spent inside it to one phase of the current frame
+    """
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        frame = self.profiler.frame_times
+        frame[self.name] = frame.get(self.name, 0.0) + time.perf_counter() - self.start
+        return False
+
+class NullTimer:
+    """
+    What phase() returns while profiling is off: does nothing at all
+    """
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+NULL_TIMER = NullTimer()
+
+class Profiler:
+    """
+    Named phase timers and counters, collected per frame into a rolling history.
+    While disabled every call returns right away, so the hooks can stay in the game loop
+    """
+    def __init__(self, history_size = 240, enabled = False):
+        self.enabled = enabled
+        self.history_size = history_size
+
+        self.timers = {}
+        # This frame: phase -> seconds, counter -> amount
+        self.frame_times = {}
+        self.frame_counts = {}
+        self.frame_start = time.perf_counter()
+
+        # Last history_size frames: name -> deque of values
+        self.times = {}
+        self.counts = {}
+
+    def phase(self, name):
+        if not self.enabled:
+            return NULL_TIMER
+
+        timer = self.timers.get(name)
+        if timer is None:
+            timer = self.timers[name] = PhaseTimer(self, name)
+
+        return timer
+
+    def ai_phase(self, ai):
+        # Separate timer per AI class, the name is only built when profiling is on
+        if not self.enabled:
+            return NULL_TIMER
+
+        return self.phase('ai.' + type(ai).__name__)
+
+    def count(self, name, amount = 1):
+        if self.enabled:
+            self.frame_counts[name] = self.frame_counts.get(name, 0) + amount
+
+    def toggle(self):
+        self.enabled = not self.enabled
+        self.reset()
+
+    def reset(self):
+        self.frame_times.clear()
+        self.frame_counts.clear()
+        self.times.clear()
+        self.counts.clear()
+        self.frame_start = time.perf_counter()
+
+    def start_frame(self):
+        # Frame time is counted from here, so time spent waiting for input can be left out
+        self.frame_start = time.perf_counter()
+
+    def end_frame(self):
+        if not self.enabled:
+            return
+
+        now = time.perf_counter()
+        self.frame_times['frame'] = now - self.frame_start
+        self.frame_start = now
+
+        for history, frame in ((self.times, self.frame_times), (self.counts, self.frame_counts)):
+            # Phases that didn't run this frame get a zero, so all histories stay aligned by frame
+            for name in history.keys() | frame.keys():
+                values = history.get(name)
+                if values is None:
+                    values = history[name] = deque(maxlen=self.history_size)
+                values.append(frame.get(name, 0))
+            frame.clear()
+
+    def stats(self):
+        """
+        name -> {'avg', 'p95', 'max'} over the rolling history. Times are in milliseconds
+        """
+        results = {}
+
+        for history, scale in ((self.times, 1000.0), (self.counts, 1)):
+            for name, values in history.items():
+                ordered = sorted(values)
+                results[name] = {
+                    'avg': sum(ordered) * scale / len(ordered),
+                    'p95': ordered[int(len(ordered) * 0.95) - 1 if len(ordered) > 1 else 0] * scale,
+                    'max': ordered[-1] * scale
+                }
+
+        return results
+
+    def histogram(self, name = 'frame', buckets = 10):
+        """
+        Frame time histogram of a phase: list of (bucket upper bound in ms, frames in the bucket)
+        """
+        values = self.times.get(name)
+        if not values:
+            return []
+
+        top = max(values) * 1000.0 or 1.0
+        step = top / buckets
+        counts = [0] * buckets
+        for value in values:
+            counts[min(int(value * 1000.0 / step), buckets - 1)] += 1
+
+        return [(step * (i + 1), count) for i, count in enumerate(counts)]
+
+    def overlay_lines(self):
+        # Text for the in-game overlay: one line per phase/counter and the frame time histogram
+        stats = self.stats()
+        lines = ['{0:<20}{1:>8}{2:>8}{3:>8}'.format('phase', 'avg', 'p95', 'max')]
+
+        for name in sorted(stats):
+            s = stats[name]
+            lines.append('{0:<20}{1:>8.2f}{2:>8.2f}{3:>8.2f}'.format(name[:19], s['avg'], s['p95'], s['max']))
+
+        histogram = self.histogram()
+        if histogram:
+            most = max(count for _, count in histogram) or 1
+            lines.append('frame time, ms')
+            for bound, count in histogram:
+                lines.append('{0:>7.2f} {1}'.format(bound, '#' * int(count * 30 / most)))
+
+        return lines
+
+    def dump(self, path):
+        data = {
+            'stats': self.stats(),
+            'histogram': self.histogram(),
+            'times_ms': {name: [value * 1000.0 for value in values] for name, values in self.times.items()},
+            'counts': {name: list(values) for name, values in self.counts.items()}
+        }
+
+        with open(path, 'w') as f:
+            json.dump(data, f, indent=2)
+
+# One profiler for the whole game, so any module can put its hooks in
+profiler = Profiler()
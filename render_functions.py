@@ -1,9 +1,9 @@
+import numpy as np
 import tcod as libtcod
 
 from enum import Enum
 
 from game_states import GameStates
-from menus import inventory_menu
 
 # Low priority means closer to the ground
 class RenderOrder(Enum):
@@ -11,87 +11,50 @@ class RenderOrder(Enum):
     ITEM = 2
     ACTOR = 3
 
-def get_names_under_mouse(mouse, entities, fov_map):
-    (x, y) = (mouse.cx, mouse.cy)
+def get_names_under_mouse(mouse, entities, fov_map, camera):
+    map_point = camera.to_map(mouse.cx, mouse.cy)
+
+    if map_point is None:
+        return ''
+
+    (x, y) = map_point
     
     names = []
     
-    for entity in entities:
-        if entity.x == x and entity.y == y and libtcod.map_is_in_fov(fov_map, entity.x, entity.y):
-            if entity.fighter:
-                names.append('{0} HP: {1}/{2}'.format(entity.name, entity.fighter.hp, entity.fighter.max_hp))
-            else:
-                names.append(entity.name)
+    # Everything on the tile is in sight or nothing is
+    if not fov_map.fov[x, y]:
+        return ''
+
+    for entity in entities.at(x, y):
+        if entity.fighter:
+            names.append('{0} HP: {1}/{2}'.format(entity.name, entity.fighter.hp, entity.fighter.max_hp))
+        else:
+            names.append(entity.name)
 
     names = '; '.join(names)
 
     return names.capitalize()
 
-# Render UI
-# panel - Console for UI
-def render_bar(panel, x, y, total_width, name, value, maximum, bar_color, back_color):
-    bar_width = int(float(value) / maximum * total_width)
-
-    libtcod.console_set_default_background(panel, back_color)
-    libtcod.console_rect(panel, x, y, total_width, 1, False, libtcod.BKGND_SCREEN)
+# Render Entities
+def render_all(con, root, entities, player, game_map, camera, fov_map, fov_recompute, screen_width, screen_height, 
+                ui_panel, ui_panel_y, message_log, mouse, game_state, colors,
+                redraw_map = True):
+    
+    # Draw the tiles in the camera view (camera only moves together with the player, so with FOV).
+    # While the camera stays, only the tiles that came into sight or went out of it change
+    if redraw_map:
+        render_map(con, game_map, camera, fov_map, colors)
+    elif fov_recompute:
+        render_fov_changes(con, game_map, camera, fov_map, colors)
 
-    libtcod.console_set_default_background(panel, bar_color)
-    if bar_width > 0:
-        libtcod.console_rect(panel, x, y, bar_width, 1, False, libtcod.BKGND_SCREEN)
+    # Draw the entities in sight (Sorted by RenderOrder)
+    draw_entities(con, entities, fov_map, camera)
 
-    libtcod.console_set_default_foreground(panel, libtcod.white)
-    libtcod.console_print_ex(panel, int(x + total_width / 2), y, libtcod.BKGND_NONE, libtcod.CENTER,
-                            '{0}: {1}/{2}'.format(name, value, maximum))
+    libtcod.console_blit(con, 0, 0, screen_width, screen_height, root, 0, 0)
 
-# Render Entities
-def render_all(con, entities, player, game_map, fov_map, fov_recompute, screen_width, screen_height, 
-                ui_panel, bar_width, ui_panel_height, ui_panel_y, message_log, mouse, game_state, colors):
-    
-    # Draw all the tiles in the game map
-    if fov_recompute:
-        for y in range(game_map.height):
-            for x in range(game_map.width):
-                visible = libtcod.map_is_in_fov(fov_map, x, y)
-                wall = game_map.tiles[x][y].block_sight
-
-                if visible:
-                    if wall:
-                        libtcod.console_set_char_background(con, x, y, colors.get('light_wall'), libtcod.BKGND_SET)
-                    else:
-                        libtcod.console_set_char_background(con, x, y, colors.get('light_ground'), libtcod.BKGND_SET)
-                    game_map.tiles[x][y].explored = True
-                elif game_map.tiles[x][y].explored:
-                    if wall:
-                        libtcod.console_set_char_background(con, x, y, colors.get('dark_wall'), libtcod.BKGND_SET)
-                    else:
-                        libtcod.console_set_char_background(con, x, y, colors.get('dark_ground'), libtcod.BKGND_SET)
-
-    # Draw all entities in the list (Sorted by RenderOrder)
-    entities_by_order = sorted(entities, key = lambda x: x.render_order.value)
-    for entity in entities_by_order:
-        draw_entity(con, entity, fov_map)    
-
-    libtcod.console_blit(con, 0, 0, screen_width, screen_height, 0, 0, 0)
-
-    # Render UI
-    libtcod.console_set_default_background(ui_panel, libtcod.black)
-    libtcod.console_clear(ui_panel)
-
-    ## Print messages (1 line at a time)
-    y = 1
-    for message in message_log.messages:
-        libtcod.console_set_default_foreground(ui_panel, message.color)
-        libtcod.console_print_ex(ui_panel, message_log.x, y, libtcod.BKGND_NONE, libtcod.LEFT, message.text)
-        y += 1
-
-    render_bar(ui_panel, 1, 1, bar_width, 'HP', player.fighter.hp, player.fighter.max_hp, libtcod.light_red, libtcod.darker_red)
-
-    libtcod.console_set_default_foreground(ui_panel, libtcod.light_gray)
-    ### Hover mouse entities
-    libtcod.console_print_ex(ui_panel, 1, 0, libtcod.BKGND_NONE, libtcod.LEFT, get_names_under_mouse(mouse, entities, fov_map))
-
-    # TODO: WHAT THE HECK blit IS DOING?
-    libtcod.console_blit(ui_panel, 0, 0, screen_width, ui_panel_height, 0, 0, ui_panel_y)
+    # Render UI. Widgets are drawn again only when what they show changed
+    ui_panel.render(player, message_log, entities, fov_map, mouse, camera)
+    ui_panel.blit(root, ui_panel_y)
 
     # Check for MENUS
     if game_state in (GameStates.SHOW_INVENTORY, GameStates.DROP_INVENTORY):
@@ -100,17 +63,82 @@ def render_all(con, entities, player, game_map, fov_map, fov_recompute, screen_w
         else:
             inv_title = 'Press the key next to an item to drop it, or Esc to cancel.\n'
 
-        inventory_menu(con, inv_title, player.inventory, 50, screen_width, screen_height)
-
-def clear_all(con, entities):
-    for entity in entities:
-        clear_entity(con, entity)
-
-def draw_entity(con, entity, fov_map):
-    if libtcod.map_is_in_fov(fov_map, entity.x, entity.y):
-        libtcod.console_set_default_foreground(con, entity.color)
-        libtcod.console_put_char(con, entity.x, entity.y, entity.char, libtcod.BKGND_NONE)
-
-def clear_entity(con, entity):
-    #erase the char that represents object
-    libtcod.console_put_char(con, entity.x, entity.y, ' ', libtcod.BKGND_NONE)
\ No newline at end of file
+        ui_panel.inventory_menu.render(root, inv_title, player.inventory, screen_width, screen_height)
+
+def render_map(con, game_map, camera, fov_map, colors):
+    # Explored tiles are marked by the FOV map itself
+    visible = fov_map.fov
+
+    # Only the part of the map under the camera is drawn
+    xs, ys = camera.view_slices(game_map.width, game_map.height)
+    visible = visible[xs, ys]
+    explored = game_map.explored[xs, ys]
+    wall = ~game_map.transparent[xs, ys][..., np.newaxis]
+
+    light = np.where(wall, np.asarray(colors.get('light_wall'), dtype=np.uint8),
+                     np.asarray(colors.get('light_ground'), dtype=np.uint8))
+    dark = np.where(wall, np.asarray(colors.get('dark_wall'), dtype=np.uint8),
+                    np.asarray(colors.get('dark_ground'), dtype=np.uint8))
+    new_bg = np.where(visible[..., np.newaxis], light, dark)
+    # Unexplored tiles stay black
+    new_bg[~explored] = 0
+
+    # Console arrays are [x, y] (console is created with order='F'), same as the map arrays.
+    # Only the cells whose color really changes are written
+    view_width, view_height = explored.shape
+    bg = con.bg[:view_width, :view_height]
+    dirty = (bg != new_bg).any(axis=2)
+    bg[dirty] = new_bg[dirty]
+
+def render_fov_changes(con, game_map, camera, fov_map, colors):
+    # Tiles that changed in the last FOV computation, the rest of the view is drawn right already
+    for (xs, ys), wall_color, ground_color in ((fov_map.became_visible, 'light_wall', 'light_ground'),
+                                               (fov_map.became_hidden, 'dark_wall', 'dark_ground')):
+        in_view = (xs >= camera.x) & (xs < camera.x + camera.width) & (ys >= camera.y) & (ys < camera.y + camera.height)
+        xs = xs[in_view]
+        ys = ys[in_view]
+        wall = ~game_map.transparent[xs, ys][:, np.newaxis]
+
+        con.bg[xs - camera.x, ys - camera.y] = np.where(wall, np.asarray(colors.get(wall_color), dtype=np.uint8),
+                                                        np.asarray(colors.get(ground_color), dtype=np.uint8))
+
+def clear_all(con, entities, camera):
+    #erase the chars that represent objects, all at once
+    xs, ys = entities_in_view(entities.store, camera)
+    con.ch[xs - camera.x, ys - camera.y] = ord(' ')
+
+def entities_in_view(store, camera):
+    # Map coordinates of the entities under the camera, straight from the store columns
+    xs = store.column('x')
+    ys = store.column('y')
+    in_view = (xs >= camera.x) & (xs < camera.x + camera.width) & (ys >= camera.y) & (ys < camera.y + camera.height)
+
+    return xs[in_view], ys[in_view]
+
+def draw_entities(con, entities, fov_map, camera):
+    store = entities.store
+    xs = store.column('x')
+    ys = store.column('y')
+
+    # Whole columns are filtered first, only the entities that really get drawn are touched one by one
+    shown = fov_map.fov[xs, ys]
+    shown &= (xs >= camera.x) & (xs < camera.x + camera.width) & (ys >= camera.y) & (ys < camera.y + camera.height)
+    slots = np.flatnonzero(shown)
+    # Lower render order first, so actors end up on top of items and corpses
+    slots = slots[np.argsort(store.column('render_order')[slots], kind='stable')]
+
+    for slot in slots.tolist():
+        entity = store.entities[slot]
+        x, y = camera.to_screen(entity.x, entity.y)
+        con.ch[x, y] = ord(entity.char)
+        con.fg[x, y] = entity.color
+
+def render_profiler_overlay(root, profiler, screen_width):
+    # Drawn straight on the root console, on top of everything, right side of the screen
+    lines = profiler.overlay_lines()
+    width = max(len(line) for line in lines)
+    x = screen_width - width
+
+    libtcod.console_set_default_foreground(root, libtcod.white)
+    for y, line in enumerate(lines):
+        libtcod.console_print_ex(root, x, y, libtcod.BKGND_NONE, libtcod.LEFT, line)
@@ -0,0 +1,165 @@
+"""
+Session recording and replay. The game records every session into a directory:
+
+    start/       the snapshot the session started from
+    inputs.log   {"turn": .., "seed": ..} first, then every input with its results, like the turn journal,
+                 and {"snapshot": seed} wherever the game saved and seeded the random streams again
+
+Replay it headless at full speed, drawing the map only at the chosen turns:
+
+    python replay.py recordings/session-20240101-120000 --checkpoints 100 500 --checkpoint-dir frames
+"""
+import argparse
+import os
+import shutil
+import sys
+import time
+
+import numpy as np
+import tcod as libtcod
+
+from fov_functions import initialize_fov
+from game_states import GameStates
+from loader_functions.data_loaders import load_game, saved_files, saved_turn
+from loader_functions.initialize_new_game import get_constants
+from loader_functions.turn_journal import (LineWriter, read_journal, replay_entry, restart_streams, summarize_results,
+                                          to_line)
+from turn_functions import TurnState
+
+INPUTS_FILE = 'inputs.log'
+START_DIR = 'start'
+
+class InputRecorder:
+    """
+    Records what handle_keys and handle_mouse returned during a session, so it can be replayed
+    """
+    def __init__(self, path):
+        self.path = path
+        self.writer = LineWriter(os.path.join(path, INPUTS_FILE))
+
+    def start(self, save_path, turn, seed):
+        # The session starts from the snapshot just saved, a copy of it goes with the inputs
+        start_path = os.path.join(self.path, START_DIR)
+        os.makedirs(start_path, exist_ok=True)
+        for file_name in saved_files(save_path):
+            shutil.copyfile(os.path.join(save_path, file_name), os.path.join(start_path, file_name))
+
+        self.writer.start(to_line({'turn': turn, 'seed': seed}))
+
+    def record(self, action, mouse_action, results):
+        self.writer.append(to_line({'a': action, 'm': mouse_action, 'r': summarize_results(results)}))
+
+    def snapshot(self, seed):
+        self.writer.append(to_line({'snapshot': seed}))
+
+    def close(self):
+        self.writer.close()
+
+def replay_session(path, constants = None, checkpoints = (), checkpoint_dir = None, stop_on_desync = False):
+    """
+    Plays a recorded session again without a window. Inputs which results differ from the recorded ones
+    are desyncs: they are reported as (input number, turn). Returns a report dict
+    """
+    constants = constants or get_constants()
+    checkpoints = set(checkpoints)
+
+    start_path = os.path.join(path, START_DIR)
+    player, entities, game_map, message_log, game_state = load_game(start_path)
+    turn_state = TurnState(game_state)
+    turn_state.turn = saved_turn(start_path)
+    turn_state.results = []
+    fov_map = initialize_fov(game_map)
+
+    entries = read_journal(os.path.join(path, INPUTS_FILE))
+    restart_streams(game_map, turn_state, entries[0]['seed'])
+
+    inputs = 0
+    desyncs = []
+    start = time.perf_counter()
+
+    for entry in entries[1:]:
+        if 'snapshot' in entry:
+            restart_streams(game_map, turn_state, entry['snapshot'])
+            continue
+
+        turn = turn_state.turn
+        if replay_entry(entry, constants, player, entities, game_map, fov_map, message_log, turn_state) != entry['r']:
+            desyncs.append((inputs, turn))
+            if stop_on_desync:
+                break
+        inputs += 1
+
+        # Drawn right after the checkpoint turn is played
+        if checkpoint_dir and turn_state.turn != turn and turn_state.turn in checkpoints:
+            write_checkpoint(checkpoint_dir, turn_state.turn, player, entities, game_map, message_log, constants)
+
+        if turn_state.game_state == GameStates.PLAYER_DEAD:
+            break
+
+    seconds = time.perf_counter() - start
+
+    return {
+        'inputs': inputs,
+        'turns': turn_state.turn - saved_turn(start_path),
+        'seconds': seconds,
+        'desyncs': desyncs,
+        'game': (player, entities, game_map, message_log, turn_state)
+    }
+
+def write_checkpoint(checkpoint_dir, turn, player, entities, game_map, message_log, constants):
+    # The map as text the way the player saw it: what was explored, what is in sight, and the message log.
+    # The player may have just moved, so the sight is computed again, on its own: the game's FOV map
+    # (and the explored tiles) are left as they are, drawing a checkpoint must not change the game being replayed
+    visible = libtcod.map.compute_fov(game_map.transparent, (player.x, player.y), constants['fov_radius'],
+                                      constants['fov_light_walls'], constants['fov_algorithm'])
+    explored = game_map.explored | visible
+
+    rows = []
+    for y in range(game_map.height):
+        row = []
+        for x in range(game_map.width):
+            if not explored[x, y]:
+                row.append(' ')
+            elif not game_map.transparent[x, y]:
+                row.append('#')
+            else:
+                row.append('.' if visible[x, y] else ',')
+        rows.append(row)
+
+    # Lower render order first, so actors end up on top of items and corpses (the same way draw_entities does)
+    store = entities.store
+    slots = np.flatnonzero(visible[store.column('x'), store.column('y')])
+    for slot in slots[np.argsort(store.column('render_order')[slots], kind='stable')].tolist():
+        entity = store.entities[slot]
+        rows[entity.y][entity.x] = entity.char
+
+    lines = [''.join(row) for row in rows]
+    lines.append('Turn {0}, HP {1}/{2}'.format(turn, player.fighter.hp, player.fighter.max_hp))
+    lines.extend(text for text, color in message_log.visible_lines())
+
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    with open(os.path.join(checkpoint_dir, 'turn-{0:06d}.txt'.format(turn)), 'w', encoding='utf-8') as f:
+        f.write('\n'.join(lines) + '\n')
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description='Replay a recorded session headless')
+    parser.add_argument('recording', help='session directory written by the game')
+    parser.add_argument('--checkpoints', type=int, nargs='*', default=[], help='turns to draw the map at')
+    parser.add_argument('--checkpoint-dir', default='checkpoints')
+    parser.add_argument('--stop-on-desync', action='store_true')
+    args = parser.parse_args(argv)
+
+    report = replay_session(args.recording, checkpoints=args.checkpoints, checkpoint_dir=args.checkpoint_dir,
+                            stop_on_desync=args.stop_on_desync)
+
+    print('{0} inputs, {1} turns in {2:.3f} s ({3:.1f} turns/sec)'.format(
+        report['inputs'], report['turns'], report['seconds'],
+        report['turns'] / report['seconds'] if report['seconds'] else 0.0))
+
+    for input_number, turn in report['desyncs']:
+        print('Desync at input {0} (turn {1})'.format(input_number, turn))
+
+    return 1 if report['desyncs'] else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
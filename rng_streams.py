@@ -0,0 +1,27 @@
+import random
+
+class RngStreams:
+    """
+    One seeded random.Random per subsystem ('ai', 'combat', ...), all following from one seed.
+    A subsystem drawing more numbers doesn't change what the others get, so a game can be replayed
+    from its seed and inputs
+    """
+    def __init__(self, seed = 0):
+        self.streams = {}
+        self.seed(seed)
+
+    def seed(self, seed):
+        # Streams are made again from the new seed the next time they are asked for
+        self.base_seed = seed
+        self.streams.clear()
+
+    def stream(self, name):
+        stream = self.streams.get(name)
+        if stream is None:
+            # String seeds are hashed the same way in every run, unlike hash(name)
+            stream = self.streams[name] = random.Random('{0}:{1}'.format(self.base_seed, name))
+
+        return stream
+
+# One set of streams for the whole game, like the profiler
+rng = RngStreams()
@@ -0,0 +1,196 @@
+import tcod as libtcod
+
+from game_states import GameStates
+from game_messages import Message
+from death_functions import kill_player, kill_monster
+from ai_functions import take_enemy_turns
+from turn_scheduler import TurnScheduler, FIGHT_NOISE_RADIUS
+
+class TurnState:
+    """
+    Game state the main loop carries from one frame to the next
+    """
+    def __init__(self, game_state):
+        self.game_state = game_state
+        self.previous_game_state = game_state
+        self.targeting_item = None
+        self.fov_recompute = True # we don't need to recompute FOV everytime (wait, fight, use item)
+        # Game turns played, counted by the enemy turns
+        self.turn = 0
+        # Every turn result dict goes here when it is a list (the turn journal reads and clears it)
+        self.results = None
+        # Who acts in the enemy turns, made by the first one
+        self.scheduler = None
+
+def play_player_turn(action, mouse_action, player, entities, game_map, fov_map, message_log, turn_state):
+    """
+    Applies one input (keys + mouse) to the game. Returns True if the game must exit
+    """
+    move = action.get('move')
+    exit = action.get('exit')
+    pickup = action.get('pickup')
+    show_inventory = action.get('show_inventory')
+    drop_inventory = action.get('drop_inventory')
+    inventory_index = action.get('inventory_index')
+
+    left_click = mouse_action.get('left_click')
+    right_click = mouse_action.get('right_click')
+
+    player_turn_results = []
+
+    # Movement handling
+    if move and turn_state.game_state == GameStates.PLAYERS_TURN:
+        dx, dy = move
+        dest_x = player.x + dx
+        dest_y = player.y + dy
+
+        if not game_map.is_blocked(dest_x, dest_y):
+            target = entities.blocking_at(dest_x, dest_y)
+
+            if target:
+                attack_results = player.fighter.attack(target)
+                player_turn_results.extend(attack_results)
+
+                if turn_state.scheduler:
+                    turn_state.scheduler.make_noise(entities, dest_x, dest_y, FIGHT_NOISE_RADIUS)
+            else:
+                player.move(dx, dy)
+                turn_state.fov_recompute = True
+
+        turn_state.game_state = GameStates.ENEMY_TURN
+    # Pickup handling
+    elif pickup and turn_state.game_state == GameStates.PLAYERS_TURN:
+        for entity in entities.at(player.x, player.y):
+            if entity.item:
+                pickup_results = player.inventory.add_item(entity)
+                player_turn_results.extend(pickup_results)
+
+                break
+        else:
+            message_log.add_message(Message('There is nothing here to pickup', libtcod.yellow))
+
+    # Menus display handling
+    if show_inventory:
+        turn_state.previous_game_state = turn_state.game_state
+        turn_state.game_state = GameStates.SHOW_INVENTORY
+    if drop_inventory:
+        turn_state.previous_game_state = turn_state.game_state
+        turn_state.game_state = GameStates.DROP_INVENTORY
+
+    # Items usage handling
+    if (inventory_index is not None and turn_state.previous_game_state != GameStates.PLAYER_DEAD and
+            inventory_index < len(player.inventory.items)):
+        item = player.inventory.items[inventory_index]
+        if turn_state.game_state == GameStates.SHOW_INVENTORY:
+            player_turn_results.extend(player.inventory.use(item, entities=entities, fov_map=fov_map))
+        elif turn_state.game_state == GameStates.DROP_INVENTORY:
+            player_turn_results.extend(player.inventory.drop_item(item))
+
+    if turn_state.game_state == GameStates.TARGETING:
+        if left_click:
+            target_x, target_y = left_click
+
+            item_use_results = player.inventory.use(turn_state.targeting_item, entities=entities, fov_map=fov_map,
+                                                    target_x=target_x, target_y=target_y)
+            player_turn_results.extend(item_use_results)
+        elif right_click:
+            player_turn_results.append({'targeting_cancelled': True})
+
+    if exit:
+        if turn_state.game_state in (GameStates.SHOW_INVENTORY, GameStates.DROP_INVENTORY):
+            turn_state.game_state = turn_state.previous_game_state
+        elif turn_state.game_state == GameStates.TARGETING:
+            player_turn_results.append({'targeting_cancelled': True})
+        else:
+            return True
+
+    # Print turn results
+    for p_t_result in player_turn_results:
+        message = p_t_result.get('message')
+        dead_entity = p_t_result.get('dead')
+        item_added =p_t_result.get('item_added')
+        item_consumed = p_t_result.get('item_consumed')
+        item_dropped = p_t_result.get('item_dropped')
+        targeting = p_t_result.get('targeting')
+        targeting_cancelled = p_t_result.get('targeting_cancelled')
+
+        if message:
+            message_log.add_message(message)
+
+        if dead_entity:
+            if dead_entity == player:
+                message, turn_state.game_state = kill_player(dead_entity)
+            else:
+                message = kill_monster(dead_entity)
+            message_log.add_message(message)
+
+        if item_added:
+            entities.remove(item_added)
+            turn_state.game_state = GameStates.ENEMY_TURN
+
+        if item_consumed:
+            turn_state.game_state = GameStates.ENEMY_TURN
+
+        if targeting:
+            turn_state.previous_game_state = GameStates.PLAYERS_TURN
+            turn_state.game_state = GameStates.TARGETING
+
+            turn_state.targeting_item = targeting
+
+            message_log.add_message(turn_state.targeting_item.item.targeting_message)
+
+        if targeting_cancelled:
+            turn_state.game_state = turn_state.previous_game_state
+
+            message_log.add_message(Message('Targeting cancelled'))
+
+        if item_dropped:
+            entities.append(item_dropped)
+            turn_state.game_state = GameStates.ENEMY_TURN
+
+    if turn_state.results is not None:
+        turn_state.results.extend(player_turn_results)
+
+    return False
+
+def play_enemy_turn(player, entities, game_map, fov_map, message_log, turn_state, ai_distance_map = True,
+                    wake_radius = 12):
+    if turn_state.game_state != GameStates.ENEMY_TURN:
+        return
+
+    turn_state.turn += 1
+
+    # Put everyone's current position on the shared pathfinding grid once per turn
+    game_map.pathfinder.update_occupancy(entities)
+
+    if ai_distance_map:
+        game_map.pathfinder.compute_distance_map(player.x, player.y)
+
+    if turn_state.scheduler is None:
+        turn_state.scheduler = TurnScheduler(entities, wake_radius)
+
+    actors = turn_state.scheduler.due_actors(player, entities, fov_map)
+    enemy_turn_results = take_enemy_turns(player, entities, game_map, fov_map, actors)
+
+    if turn_state.results is not None:
+        turn_state.results.extend(enemy_turn_results)
+
+    for e_t_result in enemy_turn_results:
+        message = e_t_result.get('message')
+        dead_entity = e_t_result.get('dead')
+
+        if message:
+            message_log.add_message(message)
+
+        if dead_entity:
+            if dead_entity == player:
+                message, turn_state.game_state = kill_player(dead_entity)
+            else:
+                message = kill_monster(dead_entity)
+
+            message_log.add_message(message)
+
+            if turn_state.game_state == GameStates.PLAYER_DEAD:
+                break
+    else:
+        turn_state.game_state = GameStates.PLAYERS_TURN
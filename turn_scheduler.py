@@ -0,0 +1,134 @@
+import heapq
+
+from components.ai import BasicMonster
+
+# Game time a speed 100 entity needs for one action. The player always acts at speed 100
+ACTION_TIME = 100
+NORMAL_SPEED = 100
+
+# A BasicMonster out of the player's sight for that many of its actions in a row falls asleep
+SLEEP_AFTER = 5
+# Sleeping monsters this close to the player wake up even behind a wall: they hear him walk by
+HEARING_RADIUS = 3
+# How far a fight wakes monsters up
+FIGHT_NOISE_RADIUS = 8
+
+class TurnScheduler:
+    """
+    Decides who acts in the enemy turn. Only entities with an AI are in it: a heap of
+    (time of the next action, order, entity), so a turn costs as much as the number of actors due.
+    Faster entities come back sooner and may act several times per player action.
+
+    BasicMonsters do nothing out of the player's sight, so the ones that stayed out of it for a while
+    are put to sleep and taken out of the heap. They wake up when they come into view, when the player
+    gets close or when there is noise around them
+    """
+    def __init__(self, entities, wake_radius = 10):
+        self.time = 0
+        # Nothing farther than wake_radius from the player can be in his FOV
+        self.wake_radius = wake_radius
+
+        self.heap = []
+        # entity -> order, for the sleeping monsters
+        self.sleeping = {}
+        # entity -> its actions in a row spent out of sight, for the awake BasicMonsters
+        self.idle = {}
+        # FovMap.version the monsters were last woken up for
+        self.fov_version = None
+        # Entities due at the same time act in the order they were added, like in the entities list
+        self.order = 0
+
+        for entity in entities:
+            if entity.ai:
+                self.add(entity)
+
+    def add(self, entity, time = None):
+        self.order += 1
+        heapq.heappush(self.heap, (self.time if time is None else time, self.order, entity))
+
+    def due_actors(self, player, entities, fov_map):
+        """
+        Entities acting in this enemy turn, in the order they act (a fast one may be there more than once).
+        Moves the scheduler time on by one player action
+        """
+        self.wake_near(player, entities, fov_map)
+
+        actors = []
+        heap = self.heap
+        idle = self.idle
+        visible = fov_map.fov
+        # Everything due before the player's next action
+        end = self.time + ACTION_TIME
+
+        while heap and heap[0][0] < end:
+            time, order, entity = heapq.heappop(heap)
+
+            # Dead, or not on the level anymore
+            if entity.ai is None or entity.entity_index is not entities:
+                idle.pop(entity, None)
+                continue
+
+            # Sleeping is only for BasicMonsters, and only out of sight: take_turn wouldn't do anything then.
+            # Any monster coming into sight is woken up before it has to act
+            if type(entity.ai) is BasicMonster:
+                if visible[entity.x, entity.y]:
+                    idle[entity] = 0
+                else:
+                    idle_actions = idle.get(entity, 0) + 1
+                    if idle_actions >= SLEEP_AFTER:
+                        del idle[entity]
+                        self.sleeping[entity] = order
+                        continue
+                    idle[entity] = idle_actions
+
+            actors.append(entity)
+            heapq.heappush(heap, (time + ACTION_TIME * NORMAL_SPEED // entity.speed, order, entity))
+
+        self.time = end
+
+        return actors
+
+    def wake_near(self, player, entities, fov_map):
+        # Sleeping monsters that came into the player's sight or are close enough to hear him
+        seen_version = self.fov_version
+        self.fov_version = fov_map.version
+
+        if not self.sleeping:
+            return
+
+        sleeping = self.sleeping
+
+        if fov_map.version == seen_version:
+            # Same FOV as in the last enemy turn: every monster in it is awake already
+            pass
+        elif seen_version is not None and fov_map.version == seen_version + 1:
+            # Only the tiles that just came into sight can have a sleeping monster on them
+            xs, ys = fov_map.became_visible
+            for x, y in zip(xs.tolist(), ys.tolist()):
+                for entity in entities.at(x, y):
+                    if entity in sleeping:
+                        self.wake(entity)
+        else:
+            # Computed more than once since the last turn, everything around the player is checked.
+            # The spatial index only looks at the tiles there
+            visible = fov_map.fov
+            for entity in entities.in_radius(player.x, player.y, self.wake_radius):
+                if entity in sleeping and visible[entity.x, entity.y]:
+                    self.wake(entity)
+
+        self.make_noise(entities, player.x, player.y, HEARING_RADIUS)
+
+    def make_noise(self, entities, x, y, radius):
+        """
+        Wakes up the sleeping monsters not farther than radius from (x, y)
+        """
+        if not self.sleeping:
+            return
+
+        for entity in entities.in_radius(x, y, radius):
+            if entity in self.sleeping:
+                self.wake(entity)
+
+    def wake(self, entity):
+        # Keeps its old order, so it acts where it stands in the entities list
+        heapq.heappush(self.heap, (self.time, self.sleeping.pop(entity), entity))
@@ -0,0 +1,158 @@
+import tcod as libtcod
+
+from menus import MENU_PAGE_SIZE, blit_menu, draw_menu, inventory_options, menu_page, menu_pages, menu_size
+from render_functions import get_names_under_mouse
+
+class Widget:
+    """
+    A part of the UI drawn into its own console and kept there. draw is called only when the state
+    the widget shows (its key) is different from the last time, otherwise the kept console is used as it is
+    """
+    def __init__(self, width, height):
+        self.console = libtcod.console.Console(width, height)
+        self.width = width
+        self.height = height
+        # Nothing is drawn yet, no key can be equal to that
+        self.key = object()
+
+    def update(self, key, *args):
+        # Returns True if the widget was drawn again
+        if key == self.key:
+            return False
+
+        self.key = key
+        libtcod.console_set_default_background(self.console, libtcod.black)
+        libtcod.console_clear(self.console)
+        self.draw(*args)
+
+        return True
+
+    def draw(self, *args):
+        raise NotImplementedError
+
+class MessagePane(Widget):
+    def draw(self, message_log):
+        # Print messages (1 line at a time)
+        for y, (text, color) in enumerate(message_log.visible_lines()):
+            libtcod.console_set_default_foreground(self.console, color)
+            libtcod.console_print_ex(self.console, 0, y, libtcod.BKGND_NONE, libtcod.LEFT, text)
+
+class Bar(Widget):
+    def __init__(self, width, name, bar_color, back_color):
+        super().__init__(width, 1)
+        self.name = name
+        self.bar_color = bar_color
+        self.back_color = back_color
+
+    def draw(self, value, maximum):
+        bar_width = int(float(value) / maximum * self.width)
+
+        libtcod.console_set_default_background(self.console, self.back_color)
+        libtcod.console_rect(self.console, 0, 0, self.width, 1, False, libtcod.BKGND_SCREEN)
+
+        libtcod.console_set_default_background(self.console, self.bar_color)
+        if bar_width > 0:
+            libtcod.console_rect(self.console, 0, 0, bar_width, 1, False, libtcod.BKGND_SCREEN)
+
+        libtcod.console_set_default_foreground(self.console, libtcod.white)
+        libtcod.console_print_ex(self.console, int(self.width / 2), 0, libtcod.BKGND_NONE, libtcod.CENTER,
+                                 '{0}: {1}/{2}'.format(self.name, value, maximum))
+
+class Tooltip(Widget):
+    def draw(self, mouse, entities, fov_map, camera):
+        ### Hover mouse entities
+        libtcod.console_set_default_foreground(self.console, libtcod.light_gray)
+        libtcod.console_print_ex(self.console, 0, 0, libtcod.BKGND_NONE, libtcod.LEFT,
+                                 get_names_under_mouse(mouse, entities, fov_map, camera))
+
+class InventoryMenu(Widget):
+    """
+    The inventory window, laid out again only when the header, the items or the page change.
+    Its console is sized by the number of options on the page, one is kept for every height used so far
+    """
+    def __init__(self, width):
+        super().__init__(width, 1)
+        self.page = 0
+        self.pages = 1
+        # height -> console, only this widget draws into them
+        self.consoles = {1: self.console}
+
+    def draw(self, header, inventory):
+        header, options = menu_page(header, inventory_options(inventory), self.page)
+        header_height, height = menu_size(header, options, self.width)
+
+        self.console = self.consoles.get(height)
+        if self.console is None:
+            self.console = self.consoles[height] = libtcod.console.Console(self.width, height)
+        else:
+            self.console.clear()
+        self.height = height
+
+        draw_menu(self.console, header, options, self.width, height, header_height)
+
+    def render(self, root, header, inventory, screen_width, screen_height):
+        # Items used up on the last page may take the page away
+        self.pages = menu_pages(len(inventory.items))
+        self.page = min(self.page, self.pages - 1)
+
+        # Drawn over the map every frame it is open
+        self.update((header, id(inventory), inventory.version, self.page), header, inventory)
+        blit_menu(self.console, root, self.width, self.height, screen_width, screen_height)
+
+    def turn_page(self, pages_forward):
+        self.page = min(max(self.page + pages_forward, 0), self.pages - 1)
+
+    def item_index(self, option_index):
+        # Index in the inventory of the option with that letter on the current page, None if there is no such letter
+        if option_index >= MENU_PAGE_SIZE:
+            return None
+
+        return self.page * MENU_PAGE_SIZE + option_index
+
+class UiPanel:
+    """
+    The panel under the map: hover names, HP bar and messages. The panel console is put together again
+    only when one of them changed, on an idle frame it is just blitted.
+    The inventory menu drawn over the map is kept here too
+    """
+    def __init__(self, width, height, bar_width, message_x, message_width, message_height, inventory_width = 50):
+        self.console = libtcod.console.Console(width, height)
+        self.width = width
+        self.height = height
+
+        # (widget, x, y) in the panel
+        self.tooltip = Tooltip(width - 1, 1)
+        self.hp_bar = Bar(bar_width, 'HP', libtcod.light_red, libtcod.darker_red)
+        self.messages = MessagePane(message_width, message_height)
+        self.layout = ((self.tooltip, 1, 0), (self.hp_bar, 1, 1), (self.messages, message_x, 1))
+
+        self.inventory_menu = InventoryMenu(inventory_width)
+
+    def render(self, player, message_log, entities, fov_map, mouse, camera):
+        changed = self.messages.update(message_log.version, message_log)
+        changed |= self.hp_bar.update((player.fighter.hp, player.fighter.max_hp),
+                                      player.fighter.hp, player.fighter.max_hp)
+        changed |= self.update_tooltip(entities, fov_map, mouse, camera)
+
+        if changed:
+            libtcod.console_set_default_background(self.console, libtcod.black)
+            libtcod.console_clear(self.console)
+            for widget, x, y in self.layout:
+                libtcod.console_blit(widget.console, 0, 0, widget.width, widget.height, self.console, x, y)
+
+        return changed
+
+    def update_tooltip(self, entities, fov_map, mouse, camera):
+        # The names change when the mouse goes to another tile, or something comes, goes or gets hurt there
+        map_point = camera.to_map(mouse.cx, mouse.cy)
+
+        if map_point is None or not fov_map.fov[map_point]:
+            key = None
+        else:
+            key = (map_point, tuple((id(entity), entity.fighter and entity.fighter.hp)
+                                    for entity in entities.at(*map_point)))
+
+        return self.tooltip.update(key, mouse, entities, fov_map, camera)
+
+    def blit(self, root, y):
+        libtcod.console_blit(self.console, 0, 0, self.width, self.height, root, 0, y)